@@ -0,0 +1,225 @@
+import bisect
+from datetime import datetime, date, time
+
+# Agenda de capacidade por (data, barbeiro, horário).
+# Cada dia guarda, para cada barbeiro, um inteiro usado como mapa de bits:
+# o bit i ligado indica que o horário i (na ordem de `horarios`) está ocupado.
+
+# Função para converter "HH:MM" em minutos desde a meia-noite
+def hora_em_minutos(hora):
+    if isinstance(hora, (datetime, time)):
+        return hora.hour * 60 + hora.minute
+    for formato in ("%H:%M", "%H:%M:%S"):
+        try:
+            h = datetime.strptime(str(hora).strip(), formato)
+            return h.hour * 60 + h.minute
+        except ValueError:
+            continue
+    return None
+
+# Função para converter datas da planilha em date
+def parse_data(valor):
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    for formato in ('%d/%m/%Y', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(str(valor).strip(), formato).date()
+        except ValueError:
+            continue
+    return None
+
+# Períodos do dia (minutos desde a meia-noite) para filtrar a busca de horários
+PERIODOS = {
+    "Qualquer horário": None,
+    "Manhã": (0, 12 * 60),
+    "Tarde": (12 * 60, 18 * 60),
+    "Noite": (18 * 60, 24 * 60),
+}
+
+# Nomes dos barbeiros quando a planilha não define a coluna "Barbeiros"
+def barbeiros_padrao(quantidade):
+    return [f"Barbeiro {i + 1}" for i in range(max(1, quantidade))]
+
+
+class Agenda:
+    def __init__(self, horarios, datas, barbeiros, duracoes=None):
+        minutos = {}
+        for h in horarios:
+            m = hora_em_minutos(h)
+            if m is not None:
+                minutos.setdefault(m, str(h).strip())
+        ordenados = sorted(minutos)
+        self.horarios = [minutos[m] for m in ordenados]
+        self.minutos = ordenados
+        self.indice_minuto = {m: i for i, m in enumerate(ordenados)}
+        self.datas = sorted({d for d in (parse_data(x) for x in datas) if d})
+        self.barbeiros = list(barbeiros) or barbeiros_padrao(1)
+        self.duracoes = {str(s): max(1, int(n)) for s, n in (duracoes or {}).items()}
+        self.todos = (1 << len(self.horarios)) - 1
+
+        # Bit i ligado quando o horário i+1 começa logo após o horário i
+        passos = [b - a for a, b in zip(ordenados, ordenados[1:]) if b > a]
+        passo = min(passos) if passos else 0
+        self.continuidade = 0
+        for i, (a, b) in enumerate(zip(ordenados, ordenados[1:])):
+            if b - a == passo:
+                self.continuidade |= 1 << i
+
+        self._ocupacao = {}
+        # Datas abertas (ordenadas) que ainda têm algum horário livre
+        self._datas_com_vaga = list(self.datas) if self.todos else []
+
+    # Quantidade de horários consecutivos que o serviço ocupa
+    def slots_do_servico(self, servico):
+        return self.duracoes.get(str(servico), 1) if servico is not None else 1
+
+    def _mapas(self, data):
+        data = parse_data(data)
+        if data not in self._ocupacao:
+            self._ocupacao[data] = [0] * len(self.barbeiros)
+        return self._ocupacao[data]
+
+    def _mascara(self, inicio, slots):
+        return ((1 << slots) - 1) << inicio
+
+    # Mapa de bits dos horários de início em que cabe um serviço de `slots`
+    # horários consecutivos, dado o mapa de horários livres
+    def _inicios(self, livres, slots):
+        inicios = livres
+        for j in range(1, slots):
+            inicios &= (self.continuidade >> (j - 1)) & (livres >> j)
+        return inicios & self.todos
+
+    # Mapa de bits livres de um barbeiro em uma data
+    def livres_do_barbeiro(self, data, barbeiro):
+        ocupado = self._mapas(data)[self.barbeiros.index(barbeiro)]
+        return ~ocupado & self.todos
+
+    # Mapa de bits dos inícios possíveis (em qualquer barbeiro) para o serviço
+    def inicios_livres(self, data, servico=None):
+        slots = self.slots_do_servico(servico)
+        resultado = 0
+        for ocupado in self._mapas(data):
+            resultado |= self._inicios(~ocupado & self.todos, slots)
+        return resultado
+
+    # Lista de horários livres para a data e o serviço
+    def horarios_livres(self, data, servico=None):
+        bits = self.inicios_livres(data, servico)
+        return [h for i, h in enumerate(self.horarios) if bits >> i & 1]
+
+    # Mantém a lista ordenada de datas com vaga após uma alteração
+    def _atualizar_datas_com_vaga(self, data):
+        data = parse_data(data)
+        pos = bisect.bisect_left(self.datas, data)
+        if pos == len(self.datas) or self.datas[pos] != data:
+            return
+        tem_vaga = any(~ocupado & self.todos for ocupado in self._mapas(data))
+        pos = bisect.bisect_left(self._datas_com_vaga, data)
+        presente = pos < len(self._datas_com_vaga) and self._datas_com_vaga[pos] == data
+        if tem_vaga and not presente:
+            self._datas_com_vaga.insert(pos, data)
+        elif not tem_vaga and presente:
+            del self._datas_com_vaga[pos]
+
+    # Mapa de bits dos horários dentro de uma janela (inicio, fim) em minutos
+    def mascara_janela(self, janela):
+        if janela is None:
+            return self.todos
+        inicio = bisect.bisect_left(self.minutos, janela[0])
+        fim = bisect.bisect_left(self.minutos, janela[1])
+        return ((1 << fim) - 1) ^ ((1 << inicio) - 1)
+
+    # Busca os primeiros `quantidade` pares (data, horário) livres para o serviço,
+    # percorrendo apenas as datas que ainda têm vaga, em ordem
+    def proximos_horarios(self, quantidade, servico=None, janela=None, a_partir_de=None):
+        a_partir_de = a_partir_de or datetime.now()
+        hoje = a_partir_de.date()
+        mascara = self.mascara_janela(janela)
+        # Horários de hoje que ainda não passaram
+        agora = a_partir_de.hour * 60 + a_partir_de.minute
+        mascara_hoje = mascara & ~((1 << bisect.bisect_right(self.minutos, agora)) - 1)
+
+        resultado = []
+        for data in self._datas_com_vaga[bisect.bisect_left(self._datas_com_vaga, hoje):]:
+            bits = self.inicios_livres(data, servico) & (mascara_hoje if data == hoje else mascara)
+            while bits and len(resultado) < quantidade:
+                menor = bits & -bits
+                resultado.append((data, self.horarios[menor.bit_length() - 1]))
+                bits ^= menor
+            if len(resultado) >= quantidade:
+                break
+        return resultado
+
+    # Primeiro barbeiro com o serviço inteiro livre a partir do horário
+    def barbeiro_livre(self, data, hora, servico=None):
+        i = self.indice_minuto.get(hora_em_minutos(hora))
+        if i is None:
+            return None
+        slots = self.slots_do_servico(servico)
+        for barbeiro, ocupado in zip(self.barbeiros, self._mapas(data)):
+            if self._inicios(~ocupado & self.todos, slots) >> i & 1:
+                return barbeiro
+        return None
+
+    def _data_aberta(self, data):
+        pos = bisect.bisect_left(self.datas, data)
+        return pos < len(self.datas) and self.datas[pos] == data
+
+    # Função para reservar um horário; retorna o barbeiro ou None se não couber.
+    # Com forcar=True (carga de agendamentos existentes) ocupa mesmo com conflito
+    # ou fora das datas abertas.
+    def reservar(self, data, hora, servico=None, barbeiro=None, forcar=False):
+        i = self.indice_minuto.get(hora_em_minutos(hora))
+        data = parse_data(data)
+        if i is None or data is None:
+            return None
+        if not forcar and not self._data_aberta(data):
+            return None
+        slots = self.slots_do_servico(servico)
+        mapas = self._mapas(data)
+        if barbeiro not in self.barbeiros:
+            barbeiro = self.barbeiro_livre(data, hora, servico)
+            if barbeiro is None:
+                if not forcar:
+                    return None
+                # Conflito na planilha: ocupar o barbeiro menos carregado
+                barbeiro = min(self.barbeiros, key=lambda b: bin(mapas[self.barbeiros.index(b)]).count("1"))
+        b = self.barbeiros.index(barbeiro)
+        # Mesma regra de barbeiro_livre: horários consecutivos livres até o fim do serviço
+        if not forcar and not self._inicios(~mapas[b] & self.todos, slots) >> i & 1:
+            return None
+        mapas[b] |= self._mascara(i, slots) & self.todos
+        self._atualizar_datas_com_vaga(data)
+        return barbeiro
+
+    # Função para liberar um horário reservado
+    def liberar(self, data, hora, servico=None, barbeiro=None):
+        i = self.indice_minuto.get(hora_em_minutos(hora))
+        if i is None or parse_data(data) is None:
+            return False
+        mascara = self._mascara(i, self.slots_do_servico(servico)) & self.todos
+        mapas = self._mapas(data)
+        candidatos = [self.barbeiros.index(barbeiro)] if barbeiro in self.barbeiros else range(len(mapas))
+        for b in candidatos:
+            if mapas[b] & mascara == mascara:
+                mapas[b] &= ~mascara
+                self._atualizar_datas_com_vaga(data)
+                return True
+        return False
+
+
+# Função para montar a agenda a partir das configurações e dos agendamentos
+def montar_agenda(horarios, datas, barbeiros, duracoes, agendamentos):
+    agenda = Agenda(horarios, datas, barbeiros, duracoes)
+    for registro in agendamentos:
+        agenda.reservar(
+            registro.get('Data'),
+            registro.get('Hora'),
+            registro.get('Serviço'),
+            barbeiro=registro.get('Barbeiro') or None,
+            forcar=True
+        )
+    return agenda
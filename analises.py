@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+
+from agenda import hora_em_minutos
+
+# Análises de ocupação (dia da semana x horário) calculadas de forma vetorizada
+
+# CONSTANTES
+DIAS_SEMANA = ['Seg', 'Ter', 'Qua', 'Qui', 'Sex', 'Sáb', 'Dom']
+STATUS_FALTA = {'faltou', 'no-show', 'nao compareceu', 'não compareceu'}
+OCUPACAO_BAIXA = 0.2
+OCUPACAO_ALTA = 0.9
+
+
+# Função para converter uma coluna de datas (DD/MM/YYYY ou YYYY-MM-DD) sem laço em Python
+def _datas_vetorizadas(coluna):
+    texto = pd.Series(coluna, dtype=object).astype(str).str.strip()
+    datas = pd.to_datetime(texto, format='%d/%m/%Y', errors='coerce')
+    return datas.fillna(pd.to_datetime(texto.str.slice(0, 10), format='%Y-%m-%d', errors='coerce'))
+
+# Função para converter uma coluna de horários (HH:MM) em minutos, NaN se inválido
+def _minutos_vetorizados(coluna):
+    texto = pd.Series(coluna, dtype=object).astype(str).str.strip()
+    horas = pd.to_datetime(texto, format='%H:%M', errors='coerce')
+    horas = horas.fillna(pd.to_datetime(texto, format='%H:%M:%S', errors='coerce'))
+    return (horas.dt.hour * 60 + horas.dt.minute).to_numpy(dtype=float)
+
+# Função para calcular ocupação, faltas e faturamento por dia da semana x horário
+def calcular_ocupacao(df_agendamentos, horarios, datas_abertas, barbeiros, duracoes=None, inicio=None, fim=None):
+    minutos = sorted({m for m in (hora_em_minutos(h) for h in horarios) if m is not None})
+    colunas = [f"{m // 60:02d}:{m % 60:02d}" for m in minutos]
+    vazio = pd.DataFrame(0.0, index=DIAS_SEMANA, columns=colunas)
+    resultado = {
+        'agendamentos': vazio.copy(),
+        'ocupacao': vazio.copy(),
+        'faturamento': vazio.copy(),
+        'faltas': None,
+        'sugestoes': pd.DataFrame(columns=['Horário', 'Ocupação', 'Sugestão']),
+    }
+    if df_agendamentos.empty or not minutos:
+        return resultado
+
+    datas = _datas_vetorizadas(df_agendamentos['Data'])
+    dentro = datas.notna().to_numpy().copy()
+    if inicio is not None:
+        dentro &= (datas >= pd.Timestamp(inicio)).to_numpy()
+    if fim is not None:
+        dentro &= (datas <= pd.Timestamp(fim)).to_numpy()
+
+    # Índice do horário de cada agendamento (-1 se não está na grade)
+    grade = np.array(minutos)
+    minutos_ag = np.nan_to_num(_minutos_vetorizados(df_agendamentos['Hora']), nan=-1)
+    pos = np.clip(np.searchsorted(grade, minutos_ag), 0, len(grade) - 1)
+    indice_horario = np.where(grade[pos] == minutos_ag, pos, -1)
+    dentro &= indice_horario >= 0
+
+    dia_semana = datas.dt.weekday.to_numpy()[dentro].astype(int)
+    horario = indice_horario[dentro]
+    precos = pd.to_numeric(df_agendamentos['Preco'], errors='coerce').fillna(0).to_numpy()[dentro]
+    slots = (
+        df_agendamentos['Serviço'].astype(str).map(duracoes or {})
+        .fillna(1).astype(int).to_numpy()[dentro]
+    )
+
+    # Contagens e faturamento no horário de início
+    agendamentos = np.zeros((7, len(minutos)))
+    faturamento = np.zeros((7, len(minutos)))
+    np.add.at(agendamentos, (dia_semana, horario), 1)
+    np.add.at(faturamento, (dia_semana, horario), precos)
+
+    # Ocupação considera também os horários seguintes de serviços longos
+    ocupados = np.zeros((7, len(minutos)))
+    for k in range(int(slots.max(initial=1))):
+        usa = (slots > k) & (horario + k < len(minutos))
+        np.add.at(ocupados, (dia_semana[usa], horario[usa] + k), 1)
+
+    # Dias em que a barbearia abriu: datas configuradas + datas com agendamento
+    dias = pd.concat([_datas_vetorizadas(list(datas_abertas)), datas[dentro]]).dropna().drop_duplicates()
+    if inicio is not None:
+        dias = dias[dias >= pd.Timestamp(inicio)]
+    if fim is not None:
+        dias = dias[dias <= pd.Timestamp(fim)]
+    dias_por_semana = np.bincount(dias.dt.weekday.to_numpy().astype(int), minlength=7)
+    capacidade = dias_por_semana[:, None] * max(1, len(barbeiros))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ocupacao = np.where(capacidade > 0, ocupados / capacidade, np.nan)
+
+    resultado['agendamentos'] = pd.DataFrame(agendamentos, index=DIAS_SEMANA, columns=colunas)
+    resultado['ocupacao'] = pd.DataFrame(ocupacao, index=DIAS_SEMANA, columns=colunas)
+    resultado['faturamento'] = pd.DataFrame(faturamento, index=DIAS_SEMANA, columns=colunas)
+
+    # Horários com mais faltas (só quando a planilha tem a coluna "Status")
+    if 'Status' in df_agendamentos.columns:
+        status = df_agendamentos['Status'].fillna('').astype(str).str.strip().str.casefold().to_numpy()[dentro]
+        faltas = np.zeros((7, len(minutos)))
+        np.add.at(faltas, (dia_semana, horario), np.isin(status, list(STATUS_FALTA)))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            taxa = np.where(agendamentos > 0, faltas / agendamentos, np.nan)
+        resultado['faltas'] = pd.DataFrame(taxa, index=DIAS_SEMANA, columns=colunas)
+
+    # Sugestões por horário: ocupação média em todos os dias abertos
+    capacidade_total = capacidade.sum()
+    if capacidade_total:
+        media = ocupados.sum(axis=0) / capacidade_total
+        sugestao = np.select(
+            [media < OCUPACAO_BAIXA, media > OCUPACAO_ALTA],
+            ['Pouco procurado: considerar remover', 'Quase lotado: considerar abrir horários próximos'],
+            default=''
+        )
+        sugestoes = pd.DataFrame({'Horário': colunas, 'Ocupação': media, 'Sugestão': sugestao})
+        resultado['sugestoes'] = sugestoes[sugestoes['Sugestão'] != ''].reset_index(drop=True)
+
+    return resultado
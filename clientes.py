@@ -1,10 +1,14 @@
 import streamlit as st
 from datetime import datetime
 import pandas as pd
-import gspread
-from google.oauth2 import service_account
 import urllib.parse
 import base64
+from tenants import (
+    obter_tenant, abrir_planilha, linha_agendamento, registrar_evento, cache_tenant, limpar_cache_tenant
+)
+from eventos import registro_serializavel
+from agenda import montar_agenda, barbeiros_padrao, parse_data, PERIODOS
+from indices import IndiceClientes, normalizar_telefone, COLUNAS_AGENDAMENTOS
 
 import streamlit as st
 
@@ -46,33 +50,21 @@ st.markdown(hide_streamlit_style, unsafe_allow_html=True)
 
 # CONSTANTES
 MAX_AGENDAMENTOS_POR_HORARIO = 1
-SPREADSHEET_ID = "1z0vz0WecZAgZp7PkV3zsx3HHXBv6W_fUEtuDrniY5Jk"
-SCOPES = [
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive"
-]
-WHATSAPP_NUMBER = "558599339802"  # Número fixo para onde os agendamentos devem ser enviados
+QUANTIDADE_SUGESTOES = 6
 
-# Função para conectar ao Google Sheets
-@st.cache_resource(ttl=3600)
-def get_gspread_client():
-    try:
-        creds = service_account.Credentials.from_service_account_info(
-            st.secrets["gcp_service_account"],
-            scopes=SCOPES
-        )
-        return gspread.authorize(creds)
-    except Exception as e:
-        st.error(f"Erro ao conectar ao Google Sheets: {str(e)}")
-        st.stop()
+# Barbearia selecionada pela URL (?loja=<id>)
+tenant = obter_tenant()
 
 # Função para obter a planilha
 def get_spreadsheet():
-    client = get_gspread_client()
-    return client.open_by_key(SPREADSHEET_ID)
+    return abrir_planilha(tenant)
 
 # Função para carregar configurações
 def carregar_configuracoes(spreadsheet):
+    cache = cache_tenant(tenant['id'], "dados")
+    config = cache.get("configuracoes")
+    if config is not None:
+        return config
     try:
         worksheet = spreadsheet.worksheet("Configuracoes")
         records = worksheet.get_all_records()
@@ -80,58 +72,107 @@ def carregar_configuracoes(spreadsheet):
         horarios = [str(r['Horarios']) for r in records if 'Horarios' in r and r['Horarios']]
         servicos = []
         precos = []
+        duracoes = {}
         
         for r in records:
             if 'Servicos' in r and 'Precos' in r and r['Servicos'] and r['Precos']:
                 servicos.append(r['Servicos'])
                 precos.append(float(r['Precos']))
+                if r.get('Duracoes'):
+                    try:
+                        # Planilhas salvas antes aceitavam "2.0"
+                        duracoes[str(r['Servicos'])] = max(1, int(float(r['Duracoes'])))
+                    except ValueError:
+                        pass
         
         datas = [str(r['Datas']) for r in records if 'Datas' in r and r['Datas']]
+        barbeiros = [str(r['Barbeiros']) for r in records if 'Barbeiros' in r and r['Barbeiros']]
         
-        return {
+        config = {
             'horarios': horarios,
             'servicos': list(zip(servicos, precos)),
-            'datas': datas
+            'datas': datas,
+            'barbeiros': barbeiros or barbeiros_padrao(MAX_AGENDAMENTOS_POR_HORARIO),
+            'duracoes': duracoes
         }
+        cache.set("configuracoes", config)
+        return config
     except Exception as e:
         st.error(f"Erro ao carregar configurações: {str(e)}")
         return None
 
 # Função para salvar agendamento
 def salvar_agendamento(spreadsheet, dados):
+    registro = dict(zip(COLUNAS_AGENDAMENTOS, dados))
     try:
         worksheet = spreadsheet.worksheet("Agendamentos")
-        worksheet.append_row(dados)
-        return True
+        worksheet.append_row(linha_agendamento(worksheet, registro))
     except Exception as e:
         st.error(f"Erro ao salvar agendamento: {str(e)}")
         return False
+    # A partir daqui o agendamento já está na planilha
+    limpar_cache_tenant(tenant['id'])
+    # Atualiza o índice em memória sem forçar a releitura da planilha
+    indice = cache_tenant(tenant['id'], "indices").get("clientes")
+    if indice is not None:
+        indice.adicionar(registro)
+    registrar_evento(tenant, 'agendamento_criado', {'registro': registro_serializavel(registro), 'origem': 'clientes'})
+    return True
 
-# Função para remover horário agendado da lista de disponíveis
-def remover_horario_disponivel(spreadsheet, hora_agendada):
+# Função para carregar os agendamentos existentes
+def carregar_agendamentos(spreadsheet):
+    cache = cache_tenant(tenant['id'], "dados")
+    agendamentos = cache.get("agendamentos")
+    if agendamentos is not None:
+        return agendamentos
     try:
-        worksheet = spreadsheet.worksheet("Configuracoes")
-        records = worksheet.get_all_records()
-        
-        # Encontrar todas as linhas que contêm o horário agendado
-        rows_to_delete = []
-        for i, r in enumerate(records, start=2):  # start=2 porque a planilha começa na linha 2 (linha 1 é cabeçalho)
-            if 'Horarios' in r and str(r['Horarios']) == hora_agendada:
-                rows_to_delete.append(i)
-        
-        # Remover as linhas encontradas (de trás para frente para não afetar os índices)
-        for row_num in sorted(rows_to_delete, reverse=True):
-            worksheet.delete_rows(row_num)
-            
-        return True
+        agendamentos = spreadsheet.worksheet("Agendamentos").get_all_records()
+        cache.set("agendamentos", agendamentos)
+        return agendamentos
     except Exception as e:
-        st.error(f"Erro ao remover horário disponível: {str(e)}")
-        return False
+        st.error(f"Erro ao carregar agendamentos: {str(e)}")
+        return None
+
+# Função para montar a agenda de capacidade (datas x barbeiros x horários)
+def obter_agenda(spreadsheet, config):
+    cache = cache_tenant(tenant['id'], "disponibilidade")
+    agenda = cache.get("agenda")
+    if agenda is None:
+        agendamentos = carregar_agendamentos(spreadsheet)
+        if agendamentos is None:
+            return None
+        agenda = montar_agenda(
+            config['horarios'], config['datas'], config['barbeiros'], config['duracoes'], agendamentos
+        )
+        cache.set("agenda", agenda)
+    return agenda
+
+# Função para obter o índice de clientes por telefone, reconciliado com a planilha
+def obter_indice_clientes(spreadsheet):
+    indice = cache_tenant(tenant['id'], "indices").get_or_create(
+        "clientes", lambda: IndiceClientes(normalizar_telefone(tenant['whatsapp_number'])[:2])
+    )
+    # Só reconcilia quando os agendamentos foram recarregados da planilha
+    cache_dados = cache_tenant(tenant['id'], "dados")
+    if cache_dados.get("indice_clientes_sincronizado") is None:
+        indice.sincronizar(carregar_agendamentos(spreadsheet) or [])
+        cache_dados.set("indice_clientes_sincronizado", True)
+    return indice
+
+# Função para preencher o telefone de um cliente que já agendou
+# (o nome gravado não é enviado a quem acessa a página pública)
+def preencher_cliente(telefone):
+    st.session_state['telefone'] = telefone
+
+# Função para selecionar uma sugestão de horário no formulário
+def escolher_horario(data_str, hora_str):
+    st.session_state['data'] = data_str
+    st.session_state['hora'] = hora_str
 
 # Função para adicionar background
-def set_bg_hack():
+def set_bg_hack(caminho_imagem):
     try:
-        with open('BACK.jpg', "rb") as f:
+        with open(caminho_imagem, "rb") as f:
             img_data = f.read()
             img_base64 = base64.b64encode(img_data).decode()
         
@@ -227,12 +268,12 @@ def set_bg_hack():
         )
 
 # Aplicar estilo
-set_bg_hack()
+set_bg_hack(tenant['background'])
 
 # Conteúdo principal
 st.markdown("<div class='main'>", unsafe_allow_html=True)
 
-st.title("✂️BARBEARIA MUCACÓ✂️")
+st.title(f"✂️{tenant['nome']}✂️")
 
 # Conectar ao Google Sheets
 spreadsheet = get_spreadsheet()
@@ -250,6 +291,62 @@ if not config['datas'] or not config['horarios']:
     st.markdown("</div>", unsafe_allow_html=True)
     st.stop()
 
+# Agenda com a ocupação de cada barbeiro por data
+agenda = obter_agenda(spreadsheet, config)
+
+if agenda is None:
+    st.error("Erro ao carregar a agenda. Por favor, tente novamente mais tarde.")
+    st.stop()
+
+# Cliente que já agendou antes pode preencher os dados pelo telefone
+telefone_cadastro = st.text_input("Já é cliente? Informe seu telefone (com DDD)", key="telefone_cadastro")
+if telefone_cadastro:
+    cliente = obter_indice_clientes(spreadsheet).buscar(telefone_cadastro)
+    if cliente:
+        # Página pública: não exibir nem preencher nome/histórico de quem digitou o telefone
+        st.success("Dados encontrados para este telefone.")
+        st.button("Usar este telefone no agendamento", on_click=preencher_cliente, args=(telefone_cadastro,))
+    else:
+        st.info("Não encontramos agendamentos com este telefone. Preencha seus dados abaixo.")
+
+# Serviço e data ficam fora do formulário para atualizar os horários livres
+col_servico, col_periodo = st.columns(2)
+with col_servico:
+    # Seleção de serviço com preços
+    servico_info = st.selectbox("Serviço desejado:", options=config['servicos'], format_func=lambda x: f"{x[0]} - R${x[1]:.2f}", key="servico")
+    servico = servico_info[0]
+    preco = servico_info[1]
+with col_periodo:
+    periodo = st.selectbox("Período preferido:", options=list(PERIODOS), key="periodo")
+
+# Próximos horários livres em todas as datas abertas
+datas_por_dia = {parse_data(d): d for d in config['datas']}
+sugestoes = [
+    (d, h) for d, h in agenda.proximos_horarios(QUANTIDADE_SUGESTOES, servico, PERIODOS[periodo])
+    if d in datas_por_dia
+]
+if sugestoes:
+    st.markdown("**Próximos horários livres:**")
+    colunas = st.columns(len(sugestoes))
+    for coluna, (dia, hora_livre) in zip(colunas, sugestoes):
+        with coluna:
+            st.button(
+                f"{dia.strftime('%d/%m')} {hora_livre}",
+                key=f"sugestao_{dia.isoformat()}_{hora_livre}",
+                on_click=escolher_horario,
+                args=(datas_por_dia[dia], hora_livre)
+            )
+else:
+    st.info("Não há horários livres para este serviço no período escolhido.")
+
+col_data, _ = st.columns(2)
+with col_data:
+    # Seleção de data
+    data_str = st.selectbox("Data disponível:", options=config['datas'], key="data")
+    data = datetime.strptime(data_str, "%d/%m/%Y").date()
+
+horarios_livres = agenda.horarios_livres(data, servico)
+
 # Formulário de agendamento
 with st.form("agendamento_form"):
     col1, col2 = st.columns(2)
@@ -258,28 +355,31 @@ with st.form("agendamento_form"):
     with col2:
         telefone = st.text_input("Telefone para contato* (com DDD)", key="telefone")    
     
-    col3, col4, col5 = st.columns(3)
-    with col3:
-        # Seleção de serviço com preços
-        servico_info = st.selectbox("Serviço desejado:", options=config['servicos'], format_func=lambda x: f"{x[0]} - R${x[1]:.2f}", key="servico")
-        servico = servico_info[0]
-        preco = servico_info[1]
-    with col4:
-        # Seleção de data
-        data_str = st.selectbox("Data disponível:", options=config['datas'], key="data")
-        data = datetime.strptime(data_str, "%d/%m/%Y").date()
-
-    with col5:    
-        # Seleção de horário
-        hora_str = st.selectbox("Horário disponível:", options=config['horarios'], key="hora")
+    # Seleção de horário
+    if horarios_livres:
+        hora_str = st.selectbox("Horário disponível:", options=horarios_livres, key="hora")
         hora = datetime.strptime(hora_str, "%H:%M").time()
+    else:
+        hora_str = None
+        st.warning("Não há horários livres para este serviço nesta data. Escolha outra data.")
     
     observacoes = st.text_area("Observações ou detalhes do corte", key="observacoes")
     
     submitted = st.form_submit_button("Agendar Horário")
     
     if submitted:
-        if nome and telefone:
+        if not hora_str:
+            st.error("Escolha uma data com horários disponíveis.")
+        elif nome and telefone:
+            # Verificação de disponibilidade em tempo real
+            cache_tenant(tenant['id'], "dados").pop("agendamentos")
+            cache_tenant(tenant['id'], "disponibilidade").clear()
+            agenda = obter_agenda(spreadsheet, config)
+            barbeiro = agenda.reservar(data, hora_str, servico) if agenda is not None else None
+            if barbeiro is None:
+                st.error("Este horário acabou de ser reservado. Por favor, escolha outro.")
+                st.stop()
+            
             # Preparar dados para salvar
             dados_agendamento = [
                 data.strftime('%d/%m/%Y'),
@@ -289,13 +389,12 @@ with st.form("agendamento_form"):
                 servico,
                 preco,
                 observacoes,
-                datetime.now().strftime('%d/%m/%Y %H:%M:%S')
+                datetime.now().strftime('%d/%m/%Y %H:%M:%S'),
+                barbeiro
             ]
             
             if salvar_agendamento(spreadsheet, dados_agendamento):
-                # Remover o horário agendado da lista de disponíveis
-                if remover_horario_disponivel(spreadsheet, hora_str):
-                    st.success("Horário agendado com sucesso!")
+                st.success("Horário agendado com sucesso!")
                 
                 # Mensagem para WhatsApp
                 mensagem = f"Olá, gostaria de confirmar meu agendamento:\n\n"
@@ -307,7 +406,7 @@ with st.form("agendamento_form"):
                 if observacoes:
                     mensagem += f"*Observações:* {observacoes}\n"
                 
-                whatsapp_url = f"https://wa.me/{WHATSAPP_NUMBER}?text={urllib.parse.quote(mensagem)}"
+                whatsapp_url = f"https://wa.me/{tenant['whatsapp_number']}?text={urllib.parse.quote(mensagem)}"
                 
                 st.markdown(
                     f'<a href="{whatsapp_url}" class="whatsapp-btn" target="_blank">'
@@ -316,6 +415,8 @@ with st.form("agendamento_form"):
                     unsafe_allow_html=True
                 )
             else:
+                # A reserva na agenda em cache não foi gravada: devolver o horário
+                agenda.liberar(data, hora_str, servico, barbeiro)
                 st.error("Ocorreu um erro ao salvar o agendamento. Por favor, tente novamente.")
         else:
             st.error("Por favor, preencha pelo menos o nome e telefone.")
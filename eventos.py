@@ -0,0 +1,203 @@
+import glob
+import json
+import math
+import os
+import threading
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos
+    fcntl = None
+
+from indices import chave_texto
+
+# Log de eventos só de inclusão (eventos.jsonl) com snapshots periódicos.
+# O estado atual é o último snapshot + os eventos gravados depois dele.
+
+# CONSTANTES
+INTERVALO_SNAPSHOT = 100  # eventos entre snapshots
+MAX_SNAPSHOTS = 3
+BLOCO_LEITURA = 64 * 1024  # bytes lidos por vez em ultimos_eventos
+
+_logs = {}
+_logs_lock = threading.Lock()
+
+
+# Função para converter valores da planilha/DataFrame em JSON
+def serializavel(valor):
+    if valor is None or (isinstance(valor, float) and math.isnan(valor)):
+        return ""
+    if hasattr(valor, 'strftime'):
+        if valor != valor:  # NaT
+            return ""
+        if hasattr(valor, 'hour'):
+            return valor.strftime('%d/%m/%Y %H:%M:%S')
+        return valor.strftime('%d/%m/%Y')
+    if hasattr(valor, 'item'):  # escalares do NumPy
+        return valor.item()
+    if isinstance(valor, (str, int, float, bool)):
+        return valor
+    return str(valor)
+
+
+def registro_serializavel(registro):
+    return {str(k): serializavel(v) for k, v in registro.items()}
+
+
+# "base" indica que o estado partiu de uma importação da planilha inteira
+def estado_vazio():
+    return {'agendamentos': {}, 'configuracoes': [], 'base': False}
+
+
+# Função que aplica um evento ao estado (usada na reconstrução)
+def aplicar_evento(estado, evento):
+    dados = evento['dados']
+    if evento['tipo'] == 'importacao':
+        estado['agendamentos'] = {chave_texto(r): r for r in dados.get('agendamentos', [])}
+        estado['configuracoes'] = dados.get('configuracoes', [])
+        estado['base'] = True
+    elif evento['tipo'] == 'agendamento_criado':
+        estado['agendamentos'][chave_texto(dados['registro'])] = dados['registro']
+    elif evento['tipo'] == 'agendamento_cancelado':
+        estado['agendamentos'].pop(chave_texto(dados['registro']), None)
+    elif evento['tipo'] == 'configuracoes_alteradas':
+        estado['configuracoes'] = dados['linhas']
+    return estado
+
+
+class LogEventos:
+    def __init__(self, pasta, intervalo_snapshot=INTERVALO_SNAPSHOT):
+        self.pasta = pasta
+        self.arquivo = os.path.join(pasta, "eventos.jsonl")
+        self.intervalo_snapshot = intervalo_snapshot
+        self._lock = threading.RLock()
+        os.makedirs(pasta, exist_ok=True)
+        snapshot = self._ultimo_snapshot()
+        self._seq = snapshot['seq']
+        self._posicao = snapshot['posicao']
+        self._base = snapshot['estado'].get('base', False)
+        self._avancar()
+
+    def _snapshots(self):
+        return sorted(glob.glob(os.path.join(self.pasta, "snapshot-*.json")))
+
+    def _ultimo_snapshot(self):
+        snapshots = self._snapshots()
+        if not snapshots:
+            return {'seq': 0, 'posicao': 0, 'estado': estado_vazio()}
+        with open(snapshots[-1], encoding="utf-8") as f:
+            return json.load(f)
+
+    # Eventos gravados a partir de uma posição (em bytes) do arquivo
+    def _eventos_desde(self, posicao):
+        if not os.path.exists(self.arquivo):
+            return
+        with open(self.arquivo, "rb") as f:
+            f.seek(posicao)
+            for linha in f:
+                if linha.strip():
+                    yield json.loads(linha)
+
+    # Lê eventos gravados por outros processos (ex.: app de clientes) desde a última leitura
+    def _avancar(self):
+        if not os.path.exists(self.arquivo):
+            return
+        with open(self.arquivo, "rb") as f:
+            f.seek(self._posicao)
+            for linha in f:
+                if linha.strip():
+                    evento = json.loads(linha)
+                    self._seq = evento['seq']
+                    self._base = self._base or evento['tipo'] == 'importacao'
+            self._posicao = f.tell()
+
+    # O log tem uma importação da planilha? Sem ela o estado só tem os
+    # agendamentos feitos depois que o log começou (ex.: pelo app de clientes)
+    def tem_base(self):
+        with self._lock:
+            self._avancar()
+            return self._base
+
+    # Função para registrar um evento no fim do log
+    def registrar(self, tipo, dados):
+        with self._lock:
+            with open(self.arquivo, "ab") as f:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    self._avancar()
+                    self._seq += 1
+                    evento = {
+                        'seq': self._seq,
+                        'tipo': tipo,
+                        'momento': datetime.now().strftime('%d/%m/%Y %H:%M:%S'),
+                        'dados': dados,
+                    }
+                    f.write((json.dumps(evento, ensure_ascii=False) + "\n").encode("utf-8"))
+                    f.flush()
+                    os.fsync(f.fileno())
+                    self._posicao = f.tell()
+                    self._base = self._base or tipo == 'importacao'
+                finally:
+                    if fcntl:
+                        fcntl.flock(f, fcntl.LOCK_UN)
+            if self._seq % self.intervalo_snapshot == 0:
+                self.criar_snapshot()
+            return evento
+
+    # Função para reconstruir o estado: último snapshot + eventos posteriores
+    def estado(self):
+        with self._lock:
+            snapshot = self._ultimo_snapshot()
+            estado = snapshot['estado']
+            for evento in self._eventos_desde(snapshot['posicao']):
+                aplicar_evento(estado, evento)
+            return estado
+
+    # Função para gravar um snapshot compacto do estado atual
+    def criar_snapshot(self):
+        with self._lock:
+            self._avancar()
+            estado = self.estado()
+            posicao = self._posicao
+            caminho = os.path.join(self.pasta, f"snapshot-{self._seq:010d}.json")
+            temporario = f"{caminho}.tmp"
+            with open(temporario, "w", encoding="utf-8") as f:
+                json.dump({'seq': self._seq, 'posicao': posicao, 'estado': estado}, f, ensure_ascii=False)
+            os.replace(temporario, caminho)
+            for antigo in self._snapshots()[:-MAX_SNAPSHOTS]:
+                os.remove(antigo)
+            return caminho
+
+    # Função para listar os eventos mais recentes (histórico de auditoria).
+    # Lê só o fim do arquivo, em blocos, até ter linhas suficientes.
+    def ultimos_eventos(self, quantidade=50):
+        if quantidade <= 0 or not os.path.exists(self.arquivo):
+            return []
+        with open(self.arquivo, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            posicao = f.tell()
+            blocos = []
+            quebras = 0
+            while posicao > 0 and quebras <= quantidade:
+                tamanho = min(BLOCO_LEITURA, posicao)
+                posicao -= tamanho
+                f.seek(posicao)
+                bloco = f.read(tamanho)
+                blocos.append(bloco)
+                quebras += bloco.count(b"\n")
+        linhas = b"".join(reversed(blocos)).split(b"\n")
+        if posicao > 0:
+            linhas = linhas[1:]  # primeira linha pode estar cortada
+        eventos = [json.loads(linha) for linha in linhas if linha.strip()]
+        return eventos[-quantidade:][::-1]
+
+
+# Função para obter o log de uma pasta (um objeto por pasta no processo)
+def abrir_log(pasta):
+    with _logs_lock:
+        caminho = os.path.abspath(pasta)
+        if caminho not in _logs:
+            _logs[caminho] = LogEventos(caminho)
+        return _logs[caminho]
@@ -1,11 +1,27 @@
 import streamlit as st
 import pandas as pd
-import gspread
-from datetime import datetime, timedelta
+from datetime import datetime, date, timedelta
 import numpy as np
-from google.oauth2 import service_account
+import os
 import time
 from gspread.exceptions import APIError
+from tenants import (
+    obter_tenant, abrir_planilha, abrir_planilha_sheets, abrir_planilha_local, planilha_e_local, linha_agendamento,
+    contar_pendentes, reenviar_pendentes,
+    abrir_log_eventos, registrar_evento, pasta_dados, cache_tenant, limpar_cache_tenant
+)
+from eventos import registro_serializavel
+from planilha_local import copiar_planilha
+from analises import calcular_ocupacao
+from agenda import montar_agenda, barbeiros_padrao
+from indices import (
+    IndiceClientes, IndiceBusca, IndiceDatas, normalizar_telefone, chave_agendamento, chave_texto,
+    COLUNAS_AGENDAMENTOS
+)
+from lembretes import (
+    MODELOS_LEMBRETE, MENSAGENS_POR_SEGUNDO, EnviadorArquivo, EnviadorLinksWhatsApp,
+    EstadoEntregas, LimitadorTaxa, processar_lembretes
+)
 
 # Configuração da página DEVE ser a primeira coisa
 st.set_page_config(
@@ -60,35 +76,21 @@ st.markdown(hide_streamlit_style, unsafe_allow_html=True)
 
 # CONSTANTES
 MAX_AGENDAMENTOS_POR_HORARIO = 1
-SPREADSHEET_ID = "1z0vz0WecZAgZp7PkV3zsx3HHXBv6W_fUEtuDrniY5Jk"
-SCOPES = [
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive"
-]
 
-# Função para conectar ao Google Sheets
-@st.cache_resource(ttl=3600)
-def get_gspread_client():
-    try:
-        creds = service_account.Credentials.from_service_account_info(
-            st.secrets["gcp_service_account"],
-            scopes=SCOPES
-        )
-        return gspread.authorize(creds)
-    except Exception as e:
-        st.error(f"Erro ao conectar ao Google Sheets: {str(e)}")
-        st.stop()
-
-# Função para obter a planilha
+# Função para obter a planilha da barbearia selecionada (?loja=<id>)
 def get_spreadsheet():
     try:
-        client = get_gspread_client()
-        return client.open_by_key(SPREADSHEET_ID)
+        return abrir_planilha(obter_tenant())
     except APIError as e:
         st.error(f"Erro ao acessar a planilha: {str(e)}")
         st.error("Verifique se a planilha existe e se a conta de serviço tem permissão")
         st.stop()
 
+# Função para limpar os caches após alterações na planilha
+def limpar_caches():
+    limpar_cache_tenant(obter_tenant()['id'])
+    st.cache_data.clear()
+
 # Função para parsear datas
 def parse_date(date_str):
     try:
@@ -103,19 +105,35 @@ def parse_date(date_str):
         except:
             return None
 
+# Função para verificar se os agendamentos estão vindo do log de eventos
+# (depois de "Reconstruir a partir do log", até o gerente voltar para a planilha)
+def usando_log():
+    return bool(cache_tenant(obter_tenant()['id'], "indices").get("agendamentos_do_log"))
+
 # Função para carregar dados com verificação robusta
 def carregar_dados(_spreadsheet, sheet_name):
+    cache = cache_tenant(obter_tenant()['id'], "dados")
+    em_cache = cache.get(sheet_name)
+    if em_cache is not None:
+        df_bruto, df = em_cache
+        st.session_state[f'debug_{sheet_name}'] = df_bruto.copy()
+        return df.copy()
+    
     try:
-        worksheet = _spreadsheet.worksheet(sheet_name)
-        records = worksheet.get_all_records()
+        if sheet_name == "Agendamentos" and usando_log():
+            records = list(abrir_log_eventos(obter_tenant()).estado()['agendamentos'].values())
+        else:
+            worksheet = _spreadsheet.worksheet(sheet_name)
+            records = worksheet.get_all_records()
         
         if not records:
             return pd.DataFrame()
         
         df = pd.DataFrame(records)
+        df_bruto = df.copy()
         
         # Debug: Mostrar dados brutos
-        st.session_state[f'debug_{sheet_name}'] = df.copy()
+        st.session_state[f'debug_{sheet_name}'] = df_bruto.copy()
         
         # Tratamento especial para cada aba
         if sheet_name == "Configuracoes":
@@ -130,7 +148,9 @@ def carregar_dados(_spreadsheet, sheet_name):
             if 'Data_Registro' in df.columns:
                 df['Data_Registro'] = pd.to_datetime(df['Data_Registro'], dayfirst=True, errors='coerce')
         
-        return df.replace('', np.nan).dropna(how='all')
+        df = df.replace('', np.nan).dropna(how='all')
+        cache.set(sheet_name, (df_bruto, df))
+        return df.copy()
     
     except Exception as e:
         st.error(f"Erro ao carregar {sheet_name}: {str(e)}")
@@ -155,47 +175,188 @@ def salvar_dados(_spreadsheet, sheet_name, df):
         
         dados = df.fillna('').astype(str).values.tolist()
         worksheet.update([df.columns.tolist()] + dados)
-        st.cache_data.clear()
-        return True
     except Exception as e:
         st.error(f"Erro ao salvar em {sheet_name}: {str(e)}")
         return False
+    limpar_caches()
+    if sheet_name == "Configuracoes":
+        registrar_evento(
+            obter_tenant(), 'configuracoes_alteradas',
+            {'linhas': [dict(zip(df.columns, linha)) for linha in dados]}
+        )
+    return True
 
-# Função para verificar horários disponíveis
-def verificar_horarios_disponiveis(_spreadsheet, data_selecionada):
-    try:
+# Função para ler barbeiros e duração (em horários) dos serviços das configurações
+def barbeiros_e_duracoes(df_config):
+    barbeiros = []
+    if 'Barbeiros' in df_config.columns:
+        barbeiros = df_config['Barbeiros'].dropna().astype(str).tolist()
+    
+    duracoes = {}
+    if 'Duracoes' in df_config.columns:
+        df_duracoes = df_config[['Servicos', 'Duracoes']].dropna()
+        duracoes = dict(zip(df_duracoes['Servicos'].astype(str), pd.to_numeric(df_duracoes['Duracoes'], errors='coerce').fillna(1).astype(int)))
+    
+    return barbeiros or barbeiros_padrao(MAX_AGENDAMENTOS_POR_HORARIO), duracoes
+
+# Função para calcular a ocupação por dia da semana x horário, em cache por período
+def obter_ocupacao(_spreadsheet, inicio, fim):
+    cache = cache_tenant(obter_tenant()['id'], "analises")
+    ocupacao = cache.get((inicio, fim))
+    if ocupacao is None:
         df_config = carregar_dados(_spreadsheet, "Configuracoes")
         df_agendamentos = carregar_dados(_spreadsheet, "Agendamentos")
-        
-        if df_config.empty:
+        barbeiros, duracoes = barbeiros_e_duracoes(df_config)
+        ocupacao = calcular_ocupacao(
+            df_agendamentos,
+            df_config['Horarios'].dropna().astype(str).tolist(),
+            df_config['Datas'].dropna().astype(str).tolist(),
+            barbeiros,
+            duracoes,
+            inicio,
+            fim
+        )
+        cache.set((inicio, fim), ocupacao)
+    return ocupacao
+
+# Função para colorir as células do mapa de ocupação
+def cor_ocupacao(valor):
+    if pd.isna(valor):
+        return ''
+    return f"background-color: rgba(76, 175, 80, {min(max(valor, 0), 1):.2f})"
+
+# Função para montar a agenda de capacidade (datas x barbeiros x horários)
+def obter_agenda(_spreadsheet):
+    cache = cache_tenant(obter_tenant()['id'], "disponibilidade")
+    agenda = cache.get("agenda")
+    if agenda is not None:
+        return agenda
+    
+    df_config = carregar_dados(_spreadsheet, "Configuracoes")
+    df_agendamentos = carregar_dados(_spreadsheet, "Agendamentos")
+    
+    if df_config.empty:
+        return None
+    
+    barbeiros, duracoes = barbeiros_e_duracoes(df_config)
+    agenda = montar_agenda(
+        df_config['Horarios'].dropna().astype(str).tolist(),
+        df_config['Datas'].dropna().astype(str).tolist(),
+        barbeiros,
+        duracoes,
+        [] if df_agendamentos.empty else df_agendamentos.to_dict('records')
+    )
+    cache.set("agenda", agenda)
+    return agenda
+
+# Função para obter o índice de clientes por telefone, reconciliado com a planilha
+def obter_indice_clientes(_spreadsheet):
+    tenant = obter_tenant()
+    indice = cache_tenant(tenant['id'], "indices").get_or_create(
+        "clientes", lambda: IndiceClientes(normalizar_telefone(tenant['whatsapp_number'])[:2])
+    )
+    # Só reconcilia quando os agendamentos foram recarregados da planilha
+    cache_dados = cache_tenant(tenant['id'], "dados")
+    if cache_dados.get("indice_clientes_sincronizado") is None:
+        df_agendamentos = carregar_dados(_spreadsheet, "Agendamentos")
+        indice.sincronizar([] if df_agendamentos.empty else df_agendamentos.to_dict('records'))
+        cache_dados.set("indice_clientes_sincronizado", True)
+    return indice
+
+# Função para obter o índice de busca por nome, telefone e observações.
+# Retorna também o mapa chave -> linha do DataFrame de agendamentos.
+def obter_indice_busca(_spreadsheet):
+    tenant = obter_tenant()
+    indice = cache_tenant(tenant['id'], "indices").get_or_create(
+        "busca", lambda: IndiceBusca(normalizar_telefone(tenant['whatsapp_number'])[:2])
+    )
+    # Só reconcilia quando os agendamentos foram recarregados da planilha
+    cache_dados = cache_tenant(tenant['id'], "dados")
+    linhas = cache_dados.get("linhas_por_chave")
+    if linhas is None:
+        df_agendamentos = carregar_dados(_spreadsheet, "Agendamentos")
+        registros = [] if df_agendamentos.empty else df_agendamentos.to_dict('records')
+        indice.sincronizar(registros)
+        linhas = {chave_agendamento(r): i for r, i in zip(registros, df_agendamentos.index)}
+        cache_dados.set("linhas_por_chave", linhas)
+    return indice, linhas
+
+# Função para obter o índice de agendamentos por data, reconciliado com a planilha
+def obter_indice_datas(_spreadsheet):
+    tenant = obter_tenant()
+    indice = cache_tenant(tenant['id'], "indices").get_or_create("datas", IndiceDatas)
+    # Só reconcilia quando os agendamentos foram recarregados da planilha
+    cache_dados = cache_tenant(tenant['id'], "dados")
+    if cache_dados.get("indice_datas_sincronizado") is None:
+        df_agendamentos = carregar_dados(_spreadsheet, "Agendamentos")
+        indice.sincronizar([] if df_agendamentos.empty else df_agendamentos.to_dict('records'))
+        cache_dados.set("indice_datas_sincronizado", True)
+    return indice
+
+# Função para preencher o formulário com os dados de um cliente
+def preencher_cliente(nome, telefone):
+    st.session_state['nome_cliente'] = nome
+    st.session_state['telefone_cliente'] = telefone
+
+# Função para verificar horários disponíveis
+def verificar_horarios_disponiveis(_spreadsheet, data_selecionada, servico=None):
+    try:
+        agenda = obter_agenda(_spreadsheet)
+        if agenda is None:
             return []
         
-        todos_horarios = df_config['Horarios'].dropna().unique().tolist()
-        
-        if df_agendamentos.empty:
-            return todos_horarios
-        
-        # Converter para string para comparação
         data_selecionada_dt = parse_date(data_selecionada)
         if not data_selecionada_dt:
-            return todos_horarios
+            return agenda.horarios
         
-        # Converter todas as datas no DataFrame para comparar
-        df_agendamentos['Data_Comparacao'] = df_agendamentos['Data'].apply(parse_date)
-        agendamentos_data = df_agendamentos[df_agendamentos['Data_Comparacao'] == data_selecionada_dt]
-        
-        contagem_horarios = agendamentos_data['Hora'].value_counts().to_dict()
-        
-        return [
-            horario for horario in todos_horarios
-            if horario not in contagem_horarios or 
-            contagem_horarios[horario] < MAX_AGENDAMENTOS_POR_HORARIO
-        ]
+        return agenda.horarios_livres(data_selecionada_dt, servico)
     
     except Exception as e:
         st.error(f"Erro ao verificar horários: {str(e)}")
         return []
 
+# Função para registrar o estado atual da planilha como primeiro evento do log
+def importar_para_log(log, df_config, df_agendamentos):
+    log.registrar('importacao', {
+        'configuracoes': [registro_serializavel(r) for r in df_config.to_dict('records')],
+        'agendamentos': [registro_serializavel(r) for r in df_agendamentos.to_dict('records')],
+    })
+
+# Função para reconstruir os índices e a agenda a partir do log de eventos.
+# Os agendamentos passam a vir do log (carregar_dados) até voltar_para_planilha(),
+# para que a reconciliação periódica não desfaça a reconstrução.
+def reconstruir_pelo_log(_spreadsheet):
+    tenant = obter_tenant()
+    log = abrir_log_eventos(tenant)
+    if not log.tem_base():
+        st.warning("O log não tem uma importação da planilha; os índices não foram alterados.")
+        return None
+    cache_tenant(tenant['id'], "indices").set("agendamentos_do_log", True)
+    limpar_caches()
+    obter_indice_clientes(_spreadsheet)
+    obter_indice_busca(_spreadsheet)
+    obter_indice_datas(_spreadsheet)
+    obter_agenda(_spreadsheet)
+    return len(carregar_dados(_spreadsheet, "Agendamentos"))
+
+# Função para voltar a montar índices e agenda a partir da planilha
+def voltar_para_planilha():
+    cache_tenant(obter_tenant()['id'], "indices").pop("agendamentos_do_log")
+    limpar_caches()
+
+# Função para copiar os dados entre o Google Sheets e os arquivos locais.
+# origem/destino são funções que abrem as planilhas (o Sheets pode estar fora do ar).
+def transferir_dados(origem, destino, descricao):
+    try:
+        copiadas = copiar_planilha(origem(), destino())
+        limpar_caches()
+        st.success(
+            f"{descricao} concluída: "
+            + ", ".join(f"{aba} ({linhas} linhas)" for aba, linhas in copiadas.items())
+        )
+    except Exception as e:
+        st.error(f"Erro na {descricao.lower()}: {str(e)}")
+
 # Função para verificar consistência
 def verificar_consistencia(df_agendamentos):
     st.subheader("Verificação de Consistência")
@@ -218,11 +379,12 @@ def verificar_consistencia(df_agendamentos):
 
 # Interface principal
 def main():
-    st.title("✂️ Painel de Retaguarda - Barbearia")
+    tenant = obter_tenant()
+    st.title(f"✂️ Painel de Retaguarda - {tenant['nome']}")
     
     # Botão de atualização manual
     if st.button("Atualizar Dados (Forçar Recarregamento)"):
-        st.cache_data.clear()
+        limpar_caches()
         st.rerun()
     
     spreadsheet = get_spreadsheet()
@@ -231,6 +393,12 @@ def main():
     df_config = carregar_dados(spreadsheet, "Configuracoes")
     df_agendamentos = carregar_dados(spreadsheet, "Agendamentos")
     
+    # Log de eventos: enquanto não houver importação, grava o estado atual como ponto de partida
+    # (o app de clientes pode ter gravado os primeiros eventos)
+    log_eventos = abrir_log_eventos(tenant)
+    if not log_eventos.tem_base() and not df_config.empty:
+        importar_para_log(log_eventos, df_config, df_agendamentos)
+    
     # Dados padrão se a planilha estiver vazia
     if df_config.empty:
         dados_padrao = {
@@ -249,12 +417,12 @@ def main():
         df_config = carregar_dados(spreadsheet, "Configuracoes")  # Recarregar após salvar
     
     # Abas do painel
-    tab1, tab2, tab3, tab4 = st.tabs(["Configurações", "Agendamentos", "Relatórios", "Depuração"])
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(["Configurações", "Agendamentos", "Relatórios", "Lembretes", "Depuração"])
     
     with tab1:
         st.header("Configurações da Barbearia")
         with st.form("config_form"):
-            col1, col2, col3 = st.columns(3)
+            col1, col2, col3, col4 = st.columns(4)
             
             with col1:
                 st.subheader("Horários Disponíveis")
@@ -266,12 +434,17 @@ def main():
             
             with col2:
                 st.subheader("Serviços e Preços")
+                duracoes_atuais = (
+                    pd.to_numeric(df_config['Duracoes'], errors='coerce').fillna(1).astype(int).tolist()
+                    if 'Duracoes' in df_config.columns else [1] * len(df_config)
+                )
                 servicos_precos = st.text_area(
-                    "Serviço:Preço (um por linha)", 
+                    "Serviço:Preço[:Horários ocupados] (um por linha)", 
                     value="\n".join([
-                        f"{s}:{p}" for s, p in zip(
+                        f"{s}:{p}" + (f":{d}" if d > 1 else "") for s, p, d in zip(
                             df_config['Servicos'].dropna().astype(str).tolist(), 
-                            df_config['Precos'].dropna().astype(float).tolist()
+                            df_config['Precos'].dropna().astype(float).tolist(),
+                            [d for s, d in zip(df_config['Servicos'], duracoes_atuais) if pd.notna(s)]
                         )
                     ]),
                     height=200
@@ -285,6 +458,17 @@ def main():
                     height=200
                 )
             
+            with col4:
+                st.subheader("Barbeiros")
+                barbeiros = st.text_area(
+                    "Barbeiros (um por linha)",
+                    value="\n".join(
+                        df_config['Barbeiros'].dropna().astype(str).tolist()
+                        if 'Barbeiros' in df_config.columns else []
+                    ),
+                    height=200
+                )
+            
             if st.form_submit_button("Salvar Configurações"):
                 try:
                     # Processar dados
@@ -292,24 +476,36 @@ def main():
                     
                     servicos = []
                     precos = []
+                    duracoes = []
                     for linha in servicos_precos.split('\n'):
                         if ':' in linha:
                             s, p = linha.split(':', 1)
-                            servicos.append(s.strip())
+                            p, _, d = p.partition(':')
                             try:
                                 precos.append(float(p.strip()))
                             except ValueError:
                                 st.warning(f"Ignorando preço inválido: {p}")
+                                continue
+                            servicos.append(s.strip())
+                            try:
+                                duracoes.append(max(1, int(d.strip())) if d.strip() else 1)
+                            except ValueError:
+                                st.warning(f"Duração inválida para {s.strip()}, usando 1 horário")
+                                duracoes.append(1)
                     
                     datas_lista = [d.strip() for d in datas.split('\n') if d.strip()]
+                    barbeiros_lista = [b.strip() for b in barbeiros.split('\n') if b.strip()]
                     
                     # Criar DataFrame
-                    max_len = max(len(horarios_lista), len(servicos), len(datas_lista))
+                    max_len = max(len(horarios_lista), len(servicos), len(datas_lista), len(barbeiros_lista))
                     df_novo = pd.DataFrame({
                         'Horarios': pd.Series(horarios_lista + [None]*(max_len - len(horarios_lista))),
                         'Servicos': pd.Series(servicos + [None]*(max_len - len(servicos))),
                         'Precos': pd.Series(precos + [None]*(max_len - len(precos))),
-                        'Datas': pd.Series(datas_lista + [None]*(max_len - len(datas_lista)))
+                        'Datas': pd.Series(datas_lista + [None]*(max_len - len(datas_lista))),
+                        # dtype object mantém as durações como inteiros ("2", não "2.0") na planilha
+                        'Duracoes': pd.Series(duracoes + [None]*(max_len - len(duracoes)), dtype=object),
+                        'Barbeiros': pd.Series(barbeiros_lista + [None]*(max_len - len(barbeiros_lista)))
                     })
                     
                     if salvar_dados(spreadsheet, "Configuracoes", df_novo):
@@ -324,17 +520,51 @@ def main():
         st.header("Agendamentos")
         
         # Seção para novo agendamento
+        # Busca de cliente pelo telefone
+        indice_clientes = obter_indice_clientes(spreadsheet)
+        indice_busca, linhas_por_chave = obter_indice_busca(spreadsheet)
+        indice_datas = obter_indice_datas(spreadsheet)
+        telefone_busca = st.text_input("Buscar cliente pelo telefone", key="telefone_busca")
+        if telefone_busca:
+            cliente = indice_clientes.buscar(telefone_busca)
+            if cliente:
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric("Cliente", cliente['nome'])
+                with col2:
+                    st.metric("Agendamentos", cliente['total'])
+                with col3:
+                    ultima = cliente['ultima_visita']
+                    st.metric("Última visita", ultima.strftime('%d/%m/%Y') if ultima else "-")
+                st.button(
+                    "Usar dados do cliente no agendamento",
+                    on_click=preencher_cliente,
+                    args=(cliente['nome'], cliente['telefone'])
+                )
+                with st.expander("Histórico do cliente"):
+                    st.dataframe(pd.DataFrame(cliente['historico']), hide_index=True)
+            else:
+                st.info("Cliente não encontrado.")
+        
+        # Data e serviço ficam fora do formulário para atualizar os horários livres
+        col_data, col_servico = st.columns(2)
+        with col_data:
+            data_selecionada = st.selectbox(
+                "Data*",
+                options=df_config['Datas'].dropna().astype(str).tolist()
+            )
+        with col_servico:
+            servico_selecionado = st.selectbox(
+                "Serviço*",
+                options=df_config['Servicos'].dropna().astype(str).tolist()
+            )
+        
+        horarios_disponiveis = verificar_horarios_disponiveis(spreadsheet, data_selecionada, servico_selecionado)
+        
         with st.form("novo_agendamento_form"):
             col1, col2 = st.columns(2)
             
             with col1:
-                data_selecionada = st.selectbox(
-                    "Data*",
-                    options=df_config['Datas'].dropna().astype(str).tolist()
-                )
-                
-                horarios_disponiveis = verificar_horarios_disponiveis(spreadsheet, data_selecionada)
-                
                 if not horarios_disponiveis:
                     st.warning("Não há horários disponíveis para esta data!")
                 else:
@@ -342,24 +572,24 @@ def main():
                         "Horário*",
                         options=horarios_disponiveis
                     )
-                
-                servico_selecionado = st.selectbox(
-                    "Serviço*",
-                    options=df_config['Servicos'].dropna().astype(str).tolist()
-                )
             
             with col2:
-                nome_cliente = st.text_input("Nome do Cliente*", max_chars=50)
-                telefone_cliente = st.text_input("Telefone*", max_chars=15)
+                nome_cliente = st.text_input("Nome do Cliente*", max_chars=50, key="nome_cliente")
+                telefone_cliente = st.text_input("Telefone*", max_chars=15, key="telefone_cliente")
                 observacoes = st.text_area("Observações", max_chars=200)
             
             if st.form_submit_button("Agendar"):
                 if nome_cliente and telefone_cliente and horarios_disponiveis:
                     try:
                         # Verificação de disponibilidade em tempo real
-                        horarios_atuais = verificar_horarios_disponiveis(spreadsheet, data_selecionada)
+                        limpar_cache_tenant(obter_tenant()['id'])
+                        horarios_atuais = verificar_horarios_disponiveis(spreadsheet, data_selecionada, servico_selecionado)
+                        agenda = obter_agenda(spreadsheet)
+                        barbeiro = None
+                        if hora_selecionada in horarios_atuais and agenda is not None:
+                            barbeiro = agenda.reservar(parse_date(data_selecionada), hora_selecionada, servico_selecionado)
                         
-                        if hora_selecionada not in horarios_atuais:
+                        if barbeiro is None:
                             st.error("Este horário já foi reservado. Por favor, escolha outro.")
                         else:
                             # Obter preço do serviço
@@ -376,16 +606,27 @@ def main():
                                 servico_selecionado,
                                 float(preco),
                                 observacoes,
-                                datetime.now().strftime('%d/%m/%Y %H:%M:%S')
+                                datetime.now().strftime('%d/%m/%Y %H:%M:%S'),
+                                barbeiro
                             ]
-                            worksheet.append_row(novo_agendamento)
-                            st.cache_data.clear()
+                            registro = dict(zip(COLUNAS_AGENDAMENTOS, novo_agendamento))
+                            worksheet.append_row(linha_agendamento(worksheet, registro))
+                            limpar_caches()
+                            indice_clientes.adicionar(registro)
+                            indice_busca.adicionar(registro)
+                            indice_datas.adicionar(registro)
+                            registrar_evento(
+                                tenant, 'agendamento_criado',
+                                {'registro': registro_serializavel(registro), 'origem': 'gerente'}
+                            )
                             
                             st.success("Agendamento realizado com sucesso!")
                             time.sleep(2)
                             st.rerun()
                     
                     except Exception as e:
+                        # A agenda em cache pode ter a reserva que não chegou à planilha
+                        cache_tenant(obter_tenant()['id'], "disponibilidade").clear()
                         st.error(f"Erro ao agendar: {str(e)}")
                 else:
                     st.error("Preencha todos os campos obrigatórios!")
@@ -400,6 +641,7 @@ def main():
             )
             
             # Filtros
+            busca = st.text_input("Buscar por nome, telefone ou observações", key="busca_agendamentos")
             col1, col2 = st.columns(2)
             
             with col1:
@@ -415,6 +657,9 @@ def main():
                 
             # Aplicar filtros
             df_filtrado = df_agendamentos.copy()
+            if busca.strip():
+                encontrados = [linhas_por_chave[c] for c in indice_busca.buscar(busca) if c in linhas_por_chave]
+                df_filtrado = df_filtrado.loc[df_filtrado.index.intersection(encontrados)]
             if filtro_data != 'Todas':
                 df_filtrado = df_filtrado[df_filtrado['Data_Exibicao'] == filtro_data]
             if filtro_servico != 'Todos':
@@ -434,6 +679,7 @@ def main():
                                 <p><span class="horario-tag">{row['Hora']}</span> <span class="servico-tag">{row['Serviço']}</span></p>
                                 <p><strong>Data:</strong> {data_exibicao}</p>
                                 <p><strong>Telefone:</strong> {row['Telefone']}</p>
+                                <p><strong>Barbeiro:</strong> {row['Barbeiro'] if pd.notna(row.get('Barbeiro')) else '-'}</p>
                                 <p><strong>Preço:</strong> R$ {row['Preco']:.2f}</p>
                                 <p><strong>Observações:</strong> {row.get('Observacoes', 'Nenhuma')}</p>
                             </div>
@@ -457,11 +703,19 @@ def main():
                     format_func=lambda x: opcoes[x]
                 )
                 
-                if st.button("Remover Agendamento"):
+                if usando_log():
+                    st.caption("Remoção indisponível enquanto os agendamentos vêm do log (ver Depuração).")
+                if st.button("Remover Agendamento", disabled=usando_log()):
                     try:
                         id_para_remover = df_filtrado.iloc[indice].name + 2  # +2 porque a planilha tem cabeçalho e índice começa em 1
                         spreadsheet.worksheet("Agendamentos").delete_rows(id_para_remover)
-                        st.cache_data.clear()
+                        limpar_caches()
+                        registro = df_filtrado.iloc[indice].to_dict()
+                        registro.pop('Data_Exibicao', None)
+                        indice_clientes.remover(registro)
+                        indice_busca.remover(registro)
+                        indice_datas.remover(registro)
+                        registrar_evento(tenant, 'agendamento_cancelado', {'registro': registro_serializavel(registro)})
                         
                         st.success("Agendamento removido com sucesso!")
                         time.sleep(2)
@@ -506,6 +760,36 @@ def main():
             except:
                 st.warning("Não foi possível gerar gráfico de faturamento")
             
+            # Ocupação por dia da semana x horário
+            st.subheader("Ocupação por Dia da Semana e Horário")
+            datas_validas = pd.to_datetime(df_agendamentos['Data_Analise'], errors='coerce').dropna()
+            periodo = st.date_input(
+                "Período da análise",
+                value=(datas_validas.min().date(), datas_validas.max().date()) if not datas_validas.empty else (),
+                format="DD/MM/YYYY"
+            )
+            if len(periodo) == 2:
+                ocupacao = obter_ocupacao(spreadsheet, periodo[0], periodo[1])
+                
+                st.write("**Ocupação (agendados / capacidade dos barbeiros)**")
+                st.dataframe(ocupacao['ocupacao'].style.map(cor_ocupacao).format("{:.0%}", na_rep="-"))
+                
+                st.write("**Faturamento por horário (R$)**")
+                st.dataframe(ocupacao['faturamento'].style.format("{:.2f}"))
+                
+                if ocupacao['faltas'] is not None:
+                    st.write("**Taxa de faltas por horário**")
+                    st.dataframe(ocupacao['faltas'].style.format("{:.0%}", na_rep="-"))
+                else:
+                    st.info("Adicione a coluna 'Status' (ex.: Faltou) na aba Agendamentos para analisar faltas.")
+                
+                if not ocupacao['sugestoes'].empty:
+                    st.write("**Sugestões para os horários**")
+                    st.dataframe(
+                        ocupacao['sugestoes'].style.format({'Ocupação': "{:.0%}"}),
+                        hide_index=True
+                    )
+            
             # Exportar
             st.subheader("Exportar Dados")
             csv = df_agendamentos.to_csv(index=False).encode('utf-8')
@@ -519,6 +803,68 @@ def main():
             st.info("Nenhum dado disponível para relatórios.")
     
     with tab4:
+        st.header("Lembretes de Agendamento")
+        tenant = obter_tenant()
+        indice_datas = obter_indice_datas(spreadsheet)
+        
+        amanha = (datetime.now() + timedelta(days=1)).date()
+        periodo_lembretes = st.date_input("Agendamentos entre", value=(amanha, amanha), format="DD/MM/YYYY")
+        if len(periodo_lembretes) == 2:
+            selecionados = indice_datas.intervalo(periodo_lembretes[0], periodo_lembretes[1])
+            estado_entregas = EstadoEntregas(os.path.join(pasta_dados(tenant), "lembretes_entregas.json"))
+            
+            st.write(f"**Agendamentos no período:** {len(selecionados)}")
+            if selecionados:
+                st.dataframe(
+                    pd.DataFrame([
+                        {'Data': r['Data'], 'Hora': r['Hora'], 'Nome': r['Nome'], 'Telefone': r['Telefone'],
+                         'Lembrete': estado_entregas.status(chave_texto(r))}
+                        for r in selecionados
+                    ]),
+                    hide_index=True
+                )
+            
+            with st.form("lembretes_form"):
+                nome_modelo = st.selectbox("Modelo", options=list(MODELOS_LEMBRETE))
+                modelo = st.text_area(
+                    "Mensagem (campos: {nome}, {nome_completo}, {servico}, {data}, {hora}, {preco}, {barbearia})",
+                    value=MODELOS_LEMBRETE[nome_modelo],
+                    height=200
+                )
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    forma_envio = st.selectbox("Envio", options=["Links do WhatsApp", "Arquivo (teste)"])
+                with col2:
+                    por_segundo = st.number_input(
+                        "Mensagens por segundo", min_value=1, value=MENSAGENS_POR_SEGUNDO,
+                        help="Vale só para envios reais; os links do WhatsApp são gerados na hora."
+                    )
+                with col3:
+                    reenviar = st.checkbox("Reenviar já entregues")
+                
+                if st.form_submit_button("Enviar lembretes"):
+                    if not selecionados:
+                        st.warning("Nenhum agendamento no período selecionado.")
+                    else:
+                        if forma_envio == "Arquivo (teste)":
+                            enviador = EnviadorArquivo(os.path.join(pasta_dados(tenant), "lembretes_enviados.jsonl"))
+                        else:
+                            enviador = EnviadorLinksWhatsApp()
+                        resumo = processar_lembretes(
+                            selecionados, modelo, enviador, estado_entregas, tenant['nome'],
+                            limitador=LimitadorTaxa(por_segundo) if enviador.entrega_real else None,
+                            ddd_padrao=normalizar_telefone(tenant['whatsapp_number'])[:2],
+                            reenviar=reenviar
+                        )
+                        st.success(
+                            f"Enviados: {resumo['enviados']} | Links gerados: {resumo['links']} | Falhas: {resumo['falhas']} | "
+                            f"Já entregues: {resumo['ignorados']} | Telefone inválido: {resumo['sem_telefone']}"
+                        )
+                        if isinstance(enviador, EnviadorLinksWhatsApp):
+                            for telefone, link in enviador.links:
+                                st.markdown(f"[Enviar para {telefone}]({link})")
+    
+    with tab5:
         st.header("Depuração e Verificação")
         
         st.subheader("Dados Brutos - Configurações")
@@ -535,6 +881,75 @@ def main():
         
         if not df_agendamentos.empty:
             verificar_consistencia(df_agendamentos)
+        
+        st.subheader("Histórico de Eventos")
+        eventos_recentes = log_eventos.ultimos_eventos(50)
+        if eventos_recentes:
+            st.dataframe(
+                pd.DataFrame([
+                    {'Seq': e['seq'], 'Momento': e['momento'], 'Evento': e['tipo'],
+                     'Detalhes': str(e['dados'].get('registro', ''))}
+                    for e in eventos_recentes
+                ]),
+                hide_index=True
+            )
+        else:
+            st.info("Nenhum evento registrado.")
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("Criar snapshot do log"):
+                st.success(f"Snapshot criado: {log_eventos.criar_snapshot()}")
+        with col2:
+            if usando_log():
+                st.info("Índices, agenda e lista de agendamentos estão sendo montados a partir do log.")
+                if st.button("Voltar a usar a planilha"):
+                    voltar_para_planilha()
+                    st.rerun()
+            elif st.button("Reconstruir índices e agenda a partir do log"):
+                total = reconstruir_pelo_log(spreadsheet)
+                if total is not None:
+                    st.success(f"Índices e agenda reconstruídos com {total} agendamentos do log.")
+        
+        st.subheader("Arquivos Locais (Contingência)")
+        tenant = obter_tenant()
+        st.write(
+            "Backend em uso: **"
+            + ("Arquivos locais" if planilha_e_local(spreadsheet) else "Google Sheets")
+            + "**"
+        )
+        pendentes = contar_pendentes(tenant)
+        if pendentes:
+            st.warning(
+                f"{pendentes} agendamento(s) feitos durante a queda do Google Sheets aguardam reenvio "
+                "(automático quando o Sheets voltar)."
+            )
+            if st.button("Reenviar agora para o Google Sheets"):
+                try:
+                    enviados = reenviar_pendentes(tenant, abrir_planilha_sheets(tenant))
+                    limpar_caches()
+                    st.success(f"{enviados} agendamento(s) reenviados.")
+                except Exception as e:
+                    st.error(f"Erro ao reenviar: {str(e)}")
+        confirmar_copia = st.checkbox(
+            "Entendo que a cópia substitui todo o conteúdo do destino (inclusive o que foi gravado lá depois da última cópia)"
+        )
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            if st.button("Importar do Google Sheets para os arquivos locais", disabled=not confirmar_copia):
+                transferir_dados(
+                    lambda: abrir_planilha_sheets(tenant), lambda: abrir_planilha_local(tenant), "Importação"
+                )
+        with col2:
+            if st.button("Exportar dos arquivos locais para o Google Sheets", disabled=not confirmar_copia):
+                transferir_dados(
+                    lambda: abrir_planilha_local(tenant), lambda: abrir_planilha_sheets(tenant), "Exportação"
+                )
+        with col3:
+            if st.button("Compactar arquivos locais"):
+                for aba in abrir_planilha_local(tenant).worksheets():
+                    aba.compactar()
+                st.success("Arquivos locais compactados!")
     
     st.markdown("---")
     st.caption(f"© {datetime.now().year} Barbearia Style - Painel Administrativo")
@@ -0,0 +1,253 @@
+import bisect
+import math
+import re
+import unicodedata
+from datetime import date
+
+from agenda import parse_data, hora_em_minutos
+
+# Colunas da aba "Agendamentos", na ordem em que as linhas são gravadas
+COLUNAS_AGENDAMENTOS = ['Data', 'Hora', 'Nome', 'Telefone', 'Serviço', 'Preco', 'Observações', 'Data_Registro', 'Barbeiro']
+
+# Índices em memória sobre os agendamentos, atualizados incrementalmente
+# (adicionar/remover) e reconciliados com a planilha por sincronizar().
+
+# Função para normalizar telefones: só dígitos, com DDD e sem código do país
+def normalizar_telefone(telefone, ddd_padrao=None):
+    if telefone is None:
+        return ""
+    if isinstance(telefone, float):
+        if math.isnan(telefone):
+            return ""
+        if telefone.is_integer():
+            telefone = int(telefone)
+    digitos = re.sub(r"\D", "", str(telefone))
+    if len(digitos) in (12, 13) and digitos.startswith("55"):
+        digitos = digitos[2:]
+    elif len(digitos) in (11, 12) and digitos.startswith("0"):
+        digitos = digitos[1:]
+    if len(digitos) in (8, 9) and ddd_padrao:
+        digitos = f"{ddd_padrao}{digitos}"
+    return digitos
+
+# Função para converter valores vazios/NaN da planilha em texto
+def texto(valor):
+    if valor is None or (isinstance(valor, float) and math.isnan(valor)):
+        return ""
+    return str(valor).strip()
+
+# Chave estável de um agendamento (não depende da linha na planilha)
+def chave_agendamento(registro):
+    data = parse_data(registro.get('Data'))
+    registrado = registro.get('Data_Registro')
+    if hasattr(registrado, 'strftime') and registrado == registrado:
+        registrado = registrado.strftime('%d/%m/%Y %H:%M:%S')
+    minutos = hora_em_minutos(registro.get('Hora'))
+    return (
+        data.isoformat() if data else texto(registro.get('Data')),
+        -1 if minutos is None else minutos,
+        texto(registro.get('Nome')).casefold(),
+        normalizar_telefone(registro.get('Telefone')),
+        texto(registrado),
+    )
+
+
+class IndiceClientes:
+    def __init__(self, ddd_padrao=None):
+        self.ddd_padrao = ddd_padrao
+        # telefone normalizado -> histórico ordenado de (data, minutos, chave)
+        self._historico = {}
+        self._registros = {}  # chave -> registro
+        self._telefones = {}  # chave -> telefone normalizado
+
+    def __len__(self):
+        return len(self._historico)
+
+    def adicionar(self, registro):
+        chave = chave_agendamento(registro)
+        telefone = normalizar_telefone(registro.get('Telefone'), self.ddd_padrao)
+        if chave in self._registros or not telefone:
+            return
+        self._registros[chave] = registro
+        self._telefones[chave] = telefone
+        data = parse_data(registro.get('Data')) or date.min
+        bisect.insort(self._historico.setdefault(telefone, []), (data, chave[1], chave))
+
+    def remover(self, registro):
+        self.remover_chave(chave_agendamento(registro))
+
+    def remover_chave(self, chave):
+        telefone = self._telefones.pop(chave, None)
+        registro = self._registros.pop(chave, None)
+        if telefone is None:
+            return
+        historico = self._historico[telefone]
+        item = (parse_data(registro.get('Data')) or date.min, chave[1], chave)
+        pos = bisect.bisect_left(historico, item)
+        if pos < len(historico) and historico[pos] == item:
+            del historico[pos]
+        if not historico:
+            del self._historico[telefone]
+
+    # Reconcilia o índice com a lista completa de agendamentos da planilha
+    def sincronizar(self, registros):
+        atuais = {chave_agendamento(r): r for r in registros}
+        for chave in set(self._registros) - set(atuais):
+            self.remover_chave(chave)
+        for chave in set(atuais) - set(self._registros):
+            self.adicionar(atuais[chave])
+
+    # Função para buscar um cliente pelo telefone
+    def buscar(self, telefone, hoje=None):
+        telefone = normalizar_telefone(telefone, self.ddd_padrao)
+        historico = self._historico.get(telefone)
+        if not historico:
+            return None
+        hoje = hoje or date.today()
+        registros = [self._registros[chave] for _, _, chave in historico]
+        pos = bisect.bisect_right(historico, (hoje, float('inf')))
+        return {
+            'telefone': telefone,
+            'nome': texto(registros[-1].get('Nome')),
+            'total': len(registros),
+            'ultima_visita': historico[pos - 1][0] if pos > 0 else None,
+            'proximo_agendamento': historico[pos][0] if pos < len(historico) else None,
+            'historico': registros,
+        }
+
+
+# Função para normalizar texto para busca: minúsculas e sem acentos
+def normalizar_texto(valor):
+    decomposto = unicodedata.normalize('NFKD', texto(valor))
+    return "".join(c for c in decomposto if not unicodedata.combining(c)).casefold()
+
+# Função para extrair os termos pesquisáveis de um agendamento
+def termos_agendamento(registro, ddd_padrao=None):
+    observacoes = registro.get('Observações', registro.get('Observacoes'))
+    termos = set(re.findall(r"\w+", normalizar_texto(f"{texto(registro.get('Nome'))} {texto(observacoes)}")))
+    telefone = normalizar_telefone(registro.get('Telefone'), ddd_padrao)
+    if telefone:
+        # Telefone completo (com DDD) e só o número, para buscar pelos dois
+        termos.update({telefone, telefone[2:]})
+    return termos
+
+
+class IndiceBusca:
+    MAX_PREFIXO = 20
+
+    def __init__(self, ddd_padrao=None):
+        self.ddd_padrao = ddd_padrao
+        self._prefixos = {}  # prefixo -> conjunto de chaves
+        self._termos = {}  # chave -> termos do agendamento
+
+    def __len__(self):
+        return len(self._termos)
+
+    def adicionar(self, registro):
+        chave = chave_agendamento(registro)
+        if chave in self._termos:
+            return
+        termos = termos_agendamento(registro, self.ddd_padrao)
+        self._termos[chave] = termos
+        for termo in termos:
+            for k in range(1, min(len(termo), self.MAX_PREFIXO) + 1):
+                self._prefixos.setdefault(termo[:k], set()).add(chave)
+
+    def remover(self, registro):
+        self.remover_chave(chave_agendamento(registro))
+
+    def remover_chave(self, chave):
+        termos = self._termos.pop(chave, None)
+        if termos is None:
+            return
+        for termo in termos:
+            for k in range(1, min(len(termo), self.MAX_PREFIXO) + 1):
+                chaves = self._prefixos.get(termo[:k])
+                if chaves is not None:
+                    chaves.discard(chave)
+                    if not chaves:
+                        del self._prefixos[termo[:k]]
+
+    # Reconcilia o índice com a lista completa de agendamentos da planilha
+    def sincronizar(self, registros):
+        atuais = {chave_agendamento(r): r for r in registros}
+        for chave in set(self._termos) - set(atuais):
+            self.remover_chave(chave)
+        for chave in set(atuais) - set(self._termos):
+            self.adicionar(atuais[chave])
+
+    # Função para buscar agendamentos cujos termos começam com cada palavra da consulta.
+    # Consulta só com números (ex.: "(85) 99999-0000") é tratada como um telefone.
+    def buscar(self, consulta):
+        palavras = re.findall(r"\w+", normalizar_texto(consulta))
+        if len(palavras) > 1 and all(p.isdigit() for p in palavras):
+            palavras = [normalizar_telefone(consulta, self.ddd_padrao)]
+        if not palavras:
+            return set()
+        conjuntos = sorted(
+            (self._prefixos.get(p[:self.MAX_PREFIXO], set()) for p in palavras),
+            key=len
+        )
+        resultado = set(conjuntos[0])
+        for conjunto in conjuntos[1:]:
+            resultado &= conjunto
+            if not resultado:
+                break
+        # Palavras maiores que o prefixo indexado são conferidas nos termos
+        longas = [p for p in palavras if len(p) > self.MAX_PREFIXO]
+        if longas:
+            resultado = {
+                c for c in resultado
+                if all(any(t.startswith(p) for t in self._termos[c]) for p in longas)
+            }
+        return resultado
+
+
+# Função para representar a chave de um agendamento como texto (arquivos JSON)
+def chave_texto(registro):
+    return "|".join(str(parte) for parte in chave_agendamento(registro))
+
+
+class IndiceDatas:
+    def __init__(self):
+        self._ordenados = []  # (data, minutos, chave) em ordem
+        self._registros = {}  # chave -> registro
+
+    def __len__(self):
+        return len(self._registros)
+
+    def _item(self, chave, registro):
+        return (parse_data(registro.get('Data')) or date.min, chave[1], chave)
+
+    def adicionar(self, registro):
+        chave = chave_agendamento(registro)
+        if chave in self._registros:
+            return
+        self._registros[chave] = registro
+        bisect.insort(self._ordenados, self._item(chave, registro))
+
+    def remover(self, registro):
+        self.remover_chave(chave_agendamento(registro))
+
+    def remover_chave(self, chave):
+        registro = self._registros.pop(chave, None)
+        if registro is None:
+            return
+        item = self._item(chave, registro)
+        pos = bisect.bisect_left(self._ordenados, item)
+        if pos < len(self._ordenados) and self._ordenados[pos] == item:
+            del self._ordenados[pos]
+
+    # Reconcilia o índice com a lista completa de agendamentos da planilha
+    def sincronizar(self, registros):
+        atuais = {chave_agendamento(r): r for r in registros}
+        for chave in set(self._registros) - set(atuais):
+            self.remover_chave(chave)
+        for chave in set(atuais) - set(self._registros):
+            self.adicionar(atuais[chave])
+
+    # Função para listar os agendamentos entre duas datas (inclusive), em ordem
+    def intervalo(self, inicio, fim):
+        ini = bisect.bisect_left(self._ordenados, (inicio,))
+        fim = bisect.bisect_right(self._ordenados, (fim, float('inf')))
+        return [self._registros[chave] for _, _, chave in self._ordenados[ini:fim]]
@@ -0,0 +1,162 @@
+import json
+import os
+import time
+import urllib.parse
+from datetime import datetime
+
+from agenda import parse_data
+from indices import chave_texto, normalizar_telefone, texto
+
+# Lembretes em lote: seleção dos agendamentos, mensagens por modelo,
+# envio por um Enviador com limite de taxa e controle de entregas em arquivo.
+
+# CONSTANTES
+MODELOS_LEMBRETE = {
+    "Lembrete padrão": (
+        "Olá, {nome}! Passando para lembrar do seu horário na {barbearia}:\n\n"
+        "*Serviço:* {servico}\n"
+        "*Data:* {data}\n"
+        "*Horário:* {hora}\n\n"
+        "Se não puder comparecer, por favor nos avise."
+    ),
+    "Lembrete curto": "{nome}, seu {servico} na {barbearia} é {data} às {hora}. Até lá!",
+}
+MENSAGENS_POR_SEGUNDO = 5
+
+
+# Dicionário que mantém {campo} desconhecido no texto em vez de gerar erro
+class _CamposModelo(dict):
+    def __missing__(self, chave):
+        return "{" + chave + "}"
+
+
+# Função para gerar a mensagem de um agendamento a partir do modelo
+def renderizar_mensagem(modelo, registro, barbearia):
+    data = parse_data(registro.get('Data'))
+    campos = _CamposModelo(
+        nome=texto(registro.get('Nome')).split(' ')[0] or "cliente",
+        nome_completo=texto(registro.get('Nome')),
+        servico=texto(registro.get('Serviço')),
+        data=data.strftime('%d/%m/%Y') if data else texto(registro.get('Data')),
+        hora=texto(registro.get('Hora')),
+        preco=texto(registro.get('Preco')),
+        barbearia=barbearia,
+    )
+    return modelo.format_map(campos)
+
+
+# Limite de envios por segundo (balde de fichas)
+class LimitadorTaxa:
+    def __init__(self, por_segundo=MENSAGENS_POR_SEGUNDO, rajada=None, relogio=time.monotonic, esperar=time.sleep):
+        self.por_segundo = float(por_segundo)
+        self.rajada = float(rajada or por_segundo)
+        self.fichas = self.rajada
+        self._relogio = relogio
+        self._esperar = esperar
+        self._ultimo = relogio()
+
+    def aguardar(self):
+        agora = self._relogio()
+        self.fichas = min(self.rajada, self.fichas + (agora - self._ultimo) * self.por_segundo)
+        self._ultimo = agora
+        if self.fichas < 1:
+            self._esperar((1 - self.fichas) / self.por_segundo)
+            self._ultimo = self._relogio()
+            self.fichas = 1
+        self.fichas -= 1
+
+
+# Interface dos enviadores: enviar() levanta exceção quando a entrega falha.
+# Só enviadores com entrega_real passam pelo limite de taxa e contam como 'enviado'.
+class Enviador:
+    entrega_real = True
+    status_sucesso = 'enviado'
+
+    def enviar(self, telefone, mensagem):
+        raise NotImplementedError
+
+
+# Enviador de teste: grava cada mensagem em um arquivo JSONL
+class EnviadorArquivo(Enviador):
+    def __init__(self, caminho):
+        self.caminho = caminho
+
+    def enviar(self, telefone, mensagem):
+        with open(self.caminho, "a", encoding="utf-8") as f:
+            f.write(json.dumps({
+                'telefone': telefone,
+                'mensagem': mensagem,
+                'momento': datetime.now().strftime('%d/%m/%Y %H:%M:%S'),
+            }, ensure_ascii=False) + "\n")
+
+
+# Enviador que gera links wa.me para o gerente abrir um a um (nada é entregue)
+class EnviadorLinksWhatsApp(Enviador):
+    entrega_real = False
+    status_sucesso = 'link_gerado'
+
+    def __init__(self):
+        self.links = []
+
+    def enviar(self, telefone, mensagem):
+        self.links.append((telefone, f"https://wa.me/{telefone}?text={urllib.parse.quote(mensagem)}"))
+
+
+# Situação de entrega de cada lembrete, gravada em um arquivo JSON
+class EstadoEntregas:
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.entregas = {}
+        if os.path.exists(caminho):
+            with open(caminho, encoding="utf-8") as f:
+                self.entregas = json.load(f)
+
+    def status(self, chave):
+        return self.entregas.get(chave, {}).get('status', 'pendente')
+
+    def marcar(self, chave, status, erro=""):
+        anterior = self.entregas.get(chave, {})
+        self.entregas[chave] = {
+            'status': status,
+            'momento': datetime.now().strftime('%d/%m/%Y %H:%M:%S'),
+            'tentativas': anterior.get('tentativas', 0) + 1,
+            'erro': erro,
+        }
+
+    def salvar(self):
+        pasta = os.path.dirname(self.caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        temporario = f"{self.caminho}.tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump(self.entregas, f, ensure_ascii=False)
+        os.replace(temporario, self.caminho)
+
+
+# Função para enviar os lembretes de uma lista de agendamentos em uma passada.
+# Agendamentos já entregues são ignorados; o estado é gravado uma vez no fim.
+def processar_lembretes(registros, modelo, enviador, estado, barbearia, limitador=None, ddd_padrao=None, reenviar=False):
+    resumo = {'enviados': 0, 'links': 0, 'falhas': 0, 'ignorados': 0, 'sem_telefone': 0}
+    try:
+        for registro in registros:
+            chave = chave_texto(registro)
+            if estado.status(chave) == 'enviado' and not reenviar:
+                resumo['ignorados'] += 1
+                continue
+            telefone = normalizar_telefone(registro.get('Telefone'), ddd_padrao)
+            if len(telefone) < 10:
+                estado.marcar(chave, 'falhou', "Telefone inválido")
+                resumo['sem_telefone'] += 1
+                continue
+            if limitador and enviador.entrega_real:
+                limitador.aguardar()
+            try:
+                enviador.enviar(f"55{telefone}", renderizar_mensagem(modelo, registro, barbearia))
+                estado.marcar(chave, enviador.status_sucesso)
+                resumo['enviados' if enviador.entrega_real else 'links'] += 1
+            except Exception as e:
+                estado.marcar(chave, 'falhou', str(e))
+                resumo['falhas'] += 1
+    finally:
+        estado.salvar()
+    return resumo
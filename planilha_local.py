@@ -0,0 +1,228 @@
+import json
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos
+    fcntl = None
+
+from gspread.exceptions import WorksheetNotFound
+from openpyxl import Workbook, load_workbook
+
+# Backend local com as mesmas operações de planilha usadas pelos apps
+# (worksheet, get_all_records, row_values, append_row, delete_rows, update_cell,
+# clear, update).
+# A leitura percorre o .xlsx em modo read-only; inclusões e remoções vão para
+# um diário (.pendentes.jsonl) ao lado do arquivo, aplicado na leitura e
+# incorporado ao .xlsx quando passa de LIMITE_PENDENTES operações.
+
+# CONSTANTES
+ARQUIVOS_PADRAO = {
+    "Configuracoes": "painel.xlsx",
+    "Agendamentos": "agendamentos_barbearia.xlsx",
+}
+LIMITE_PENDENTES = 200
+
+_locks = {}
+_locks_lock = threading.Lock()
+
+
+# Trava de um arquivo .xlsx entre threads e entre processos (clientes e gerente
+# rodam em processos separados). Reentrante: compactar() roda dentro de append_row().
+class _TravaArquivo:
+    def __init__(self, caminho):
+        self.caminho = f"{caminho}.lock"
+        self._lock = threading.RLock()
+        self._nivel = 0
+        self._arquivo = None
+
+    def __enter__(self):
+        self._lock.acquire()
+        if self._nivel == 0 and fcntl:
+            try:
+                self._arquivo = open(self.caminho, "a")
+                fcntl.flock(self._arquivo, fcntl.LOCK_EX)
+            except BaseException:
+                if self._arquivo:
+                    self._arquivo.close()
+                    self._arquivo = None
+                self._lock.release()
+                raise
+        self._nivel += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._nivel -= 1
+        if self._nivel == 0 and self._arquivo:
+            fcntl.flock(self._arquivo, fcntl.LOCK_UN)
+            self._arquivo.close()
+            self._arquivo = None
+        self._lock.release()
+
+
+# Função para obter a trava de um arquivo (também usada para outros arquivos de dados)
+def trava_arquivo(caminho):
+    with _locks_lock:
+        return _locks.setdefault(os.path.abspath(caminho), _TravaArquivo(os.path.abspath(caminho)))
+
+
+# Função para converter o valor de uma célula no texto exibido pelo Sheets
+def _texto_celula(valor):
+    if valor is None:
+        return ""
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor)
+
+
+class AbaLocal:
+    def __init__(self, caminho, title):
+        self.caminho = caminho
+        self.title = title
+        self.diario = f"{caminho}.pendentes.jsonl"
+        self._lock = trava_arquivo(caminho)
+
+    # Lê as linhas do .xlsx em modo streaming (read-only)
+    def _linhas_arquivo(self):
+        if not os.path.exists(self.caminho):
+            return []
+        wb = load_workbook(self.caminho, read_only=True, data_only=True)
+        try:
+            ws = wb[self.title] if self.title in wb.sheetnames else wb.worksheets[0]
+            linhas = [list(linha) for linha in ws.iter_rows(values_only=True)]
+        finally:
+            wb.close()
+        # Remove células vazias no fim de cada linha e linhas vazias no fim
+        for linha in linhas:
+            while linha and linha[-1] in (None, ""):
+                linha.pop()
+        while linhas and not linhas[-1]:
+            linhas.pop()
+        return linhas
+
+    def _operacoes_pendentes(self):
+        if not os.path.exists(self.diario):
+            return []
+        with open(self.diario, encoding="utf-8") as f:
+            return [json.loads(linha) for linha in f if linha.strip()]
+
+    def _registrar(self, operacao):
+        with open(self.diario, "a", encoding="utf-8") as f:
+            f.write(json.dumps(operacao, ensure_ascii=False, default=str) + "\n")
+
+    # Linhas atuais: arquivo + operações do diário
+    def _linhas(self):
+        linhas = self._linhas_arquivo()
+        for op in self._operacoes_pendentes():
+            if op["op"] == "append":
+                linhas.append(op["valores"])
+            elif op["op"] == "delete" and 0 < op["linha"] <= len(linhas):
+                del linhas[op["linha"] - 1]
+            elif op["op"] == "cell":
+                while len(linhas) < op["linha"]:
+                    linhas.append([])
+                linha = linhas[op["linha"] - 1]
+                linha.extend([None] * (op["coluna"] - len(linha)))
+                linha[op["coluna"] - 1] = op["valor"]
+        return linhas
+
+    # Regrava o .xlsx inteiro (modo write-only) e descarta o diário
+    def _gravar(self, linhas):
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(self.title)
+        for linha in linhas:
+            ws.append(linha)
+        temporario = f"{self.caminho}.tmp"
+        wb.save(temporario)
+        os.replace(temporario, self.caminho)
+        if os.path.exists(self.diario):
+            os.remove(self.diario)
+
+    def get_all_values(self):
+        with self._lock:
+            linhas = self._linhas()
+        largura = max((len(l) for l in linhas), default=0)
+        return [[_texto_celula(v) for v in l] + [""] * (largura - len(l)) for l in linhas]
+
+    def get_all_records(self):
+        with self._lock:
+            linhas = self._linhas()
+        if not linhas:
+            return []
+        cabecalho = [_texto_celula(c) for c in linhas[0]]
+        return [
+            {c: ("" if v is None else v) for c, v in zip(cabecalho, l + [None] * (len(cabecalho) - len(l)))}
+            for l in linhas[1:]
+        ]
+
+    def row_values(self, linha, **kwargs):
+        with self._lock:
+            linhas = self._linhas()
+        valores = [_texto_celula(v) for v in linhas[linha - 1]] if 0 < linha <= len(linhas) else []
+        while valores and not valores[-1]:
+            valores.pop()
+        return valores
+
+    def append_row(self, valores, **kwargs):
+        with self._lock:
+            self._registrar({"op": "append", "valores": list(valores)})
+            self._compactar_se_necessario()
+
+    def delete_rows(self, linha, fim=None):
+        with self._lock:
+            for _ in range((fim or linha) - linha + 1):
+                self._registrar({"op": "delete", "linha": int(linha)})
+            self._compactar_se_necessario()
+
+    def update_cell(self, linha, coluna, valor):
+        with self._lock:
+            self._registrar({"op": "cell", "linha": int(linha), "coluna": int(coluna), "valor": valor})
+            self._compactar_se_necessario()
+
+    def clear(self):
+        with self._lock:
+            self._gravar([])
+
+    def update(self, valores=None, range_name=None, **kwargs):
+        with self._lock:
+            self._gravar(valores or [])
+
+    # Incorpora o diário ao .xlsx
+    def compactar(self):
+        with self._lock:
+            self._gravar(self._linhas())
+
+    def _compactar_se_necessario(self):
+        # Chamado com a trava já adquirida
+        if len(self._operacoes_pendentes()) >= LIMITE_PENDENTES:
+            self.compactar()
+
+
+class PlanilhaLocal:
+    def __init__(self, pasta=".", arquivos=None):
+        self.pasta = pasta
+        self.arquivos = dict(arquivos or ARQUIVOS_PADRAO)
+        os.makedirs(pasta, exist_ok=True)
+        self.id = f"local:{os.path.abspath(pasta)}"
+
+    def worksheet(self, title):
+        if title not in self.arquivos:
+            raise WorksheetNotFound(title)
+        return AbaLocal(os.path.join(self.pasta, self.arquivos[title]), title)
+
+    def worksheets(self):
+        return [self.worksheet(title) for title in self.arquivos]
+
+
+# Função para copiar abas entre backends (Sheets -> local ou local -> Sheets)
+def copiar_planilha(origem, destino, abas=tuple(ARQUIVOS_PADRAO)):
+    copiadas = {}
+    for aba in abas:
+        valores = origem.worksheet(aba).get_all_values()
+        aba_destino = destino.worksheet(aba)
+        aba_destino.clear()
+        if valores:
+            aba_destino.update(valores)
+        copiadas[aba] = max(len(valores) - 1, 0)
+    return copiadas
@@ -0,0 +1,466 @@
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import gspread
+import streamlit as st
+from google.oauth2 import service_account
+from gspread.exceptions import WorksheetNotFound
+
+from eventos import abrir_log
+from indices import COLUNAS_AGENDAMENTOS
+from planilha_local import ARQUIVOS_PADRAO, PlanilhaLocal, trava_arquivo
+
+# CONSTANTES
+SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive"
+]
+PARAMETRO_TENANT = "loja"  # ?loja=<id> na URL seleciona a barbearia
+TENANT_PADRAO = "mucaco"
+MAX_TENANTS_EM_CACHE = 50  # Barbearias com caches ativos ao mesmo tempo
+MAX_ITENS_POR_CACHE = 32
+TTL_CACHE_DADOS = 60  # segundos
+# Caches que sobrevivem a limpar_cache_tenant (os índices se reconciliam sozinhos)
+CACHES_PERSISTENTES = {"planilha", "indices"}
+
+VARIAVEL_BACKEND = "BARBEARIA_BACKEND"  # "local" força os arquivos .xlsx (modo dev)
+
+# Registro de barbearias: id -> planilha, WhatsApp e identidade visual.
+# Outras lojas podem ser cadastradas em st.secrets["tenants"] com as mesmas chaves;
+# "spreadsheet_id" e "whatsapp_number" são obrigatórios (nunca herdados de outra loja).
+# "backend": "sheets" ou "local"; "fallback_local" usa os .xlsx de "pasta_local"
+# (padrão: locais/<id>, fora do git) quando o Google Sheets não responde;
+# "pasta_modelo" fornece os .xlsx iniciais dessa pasta.
+TENANTS = {
+    TENANT_PADRAO: {
+        "nome": "BARBEARIA MUCACÓ",
+        "spreadsheet_id": "1z0vz0WecZAgZp7PkV3zsx3HHXBv6W_fUEtuDrniY5Jk",
+        "whatsapp_number": "558599339802",
+        "background": "BACK.jpg",
+        "backend": "sheets",
+        "fallback_local": True,
+        "pasta_local": None,
+        "pasta_modelo": ".",  # planilhas .xlsx que acompanham o projeto
+        "pasta_eventos": None,  # padrão: eventos/<id> (log de eventos e lembretes)
+    },
+}
+# Padrões neutros para lojas cadastradas em st.secrets (sem dados de outra loja)
+CONFIG_PADRAO_TENANT = {
+    "background": "BACK.jpg",
+    "backend": "sheets",
+    "fallback_local": True,
+    "pasta_local": None,
+    "pasta_eventos": None,
+}
+CHAVES_OBRIGATORIAS = ("spreadsheet_id", "whatsapp_number")
+
+
+# Cache LRU com TTL opcional, seguro para uso entre sessões do Streamlit
+class CacheLRU:
+    def __init__(self, max_itens, ttl=None):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, chave, padrao=None):
+        with self._lock:
+            if chave not in self._itens:
+                return padrao
+            valor, criado_em = self._itens[chave]
+            if self.ttl is not None and time.monotonic() - criado_em > self.ttl:
+                del self._itens[chave]
+                return padrao
+            self._itens.move_to_end(chave)
+            return valor
+
+    def set(self, chave, valor):
+        with self._lock:
+            self._itens[chave] = (valor, time.monotonic())
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def get_or_create(self, chave, fabrica):
+        with self._lock:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                return self._itens[chave][0]
+            valor = fabrica()
+            self._itens[chave] = (valor, time.monotonic())
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+            return valor
+
+    def pop(self, chave, padrao=None):
+        with self._lock:
+            item = self._itens.pop(chave, None)
+            return padrao if item is None else item[0]
+
+    def clear(self):
+        with self._lock:
+            self._itens.clear()
+
+    def __len__(self):
+        return len(self._itens)
+
+
+# Função para carregar o registro de barbearias (padrão + secrets)
+def carregar_tenants():
+    tenants = {tid: dict(cfg) for tid, cfg in TENANTS.items()}
+    try:
+        # Sem secrets.toml (modo local) o acesso a st.secrets exibe um erro na página
+        extras = st.secrets.get("tenants", {}) if st.secrets.load_if_toml_exists() else {}
+    except Exception:
+        extras = {}
+    for tid, cfg in extras.items():
+        base = dict(tenants.get(tid, CONFIG_PADRAO_TENANT))
+        base.update(dict(cfg))
+        base.setdefault("nome", str(tid).upper())
+        tenants[str(tid)] = base
+    return tenants
+
+
+# Função para identificar a barbearia pela URL (?loja=<id>)
+def obter_tenant():
+    tenants = carregar_tenants()
+    tenant_id = st.query_params.get(PARAMETRO_TENANT, TENANT_PADRAO)
+    if tenant_id not in tenants:
+        st.error(f"Barbearia não encontrada: {tenant_id}")
+        st.stop()
+    faltando = [chave for chave in CHAVES_OBRIGATORIAS if not tenants[tenant_id].get(chave)]
+    if faltando:
+        st.error(f"Cadastro incompleto da barbearia {tenant_id}: falta {', '.join(faltando)}")
+        st.stop()
+    return {"id": tenant_id, **tenants[tenant_id]}
+
+
+# Cliente autorizado único, compartilhado por todas as barbearias
+@st.cache_resource(ttl=3600)
+def get_gspread_client():
+    try:
+        creds = service_account.Credentials.from_service_account_info(
+            st.secrets["gcp_service_account"],
+            scopes=SCOPES
+        )
+        return gspread.authorize(creds)
+    except Exception as e:
+        st.error(f"Erro ao conectar ao Google Sheets: {str(e)}")
+        st.stop()
+
+
+# Registro de caches por barbearia; as menos usadas são descartadas
+@st.cache_resource
+def _caches_por_tenant():
+    return CacheLRU(MAX_TENANTS_EM_CACHE)
+
+
+def _novos_caches():
+    return {
+        "planilha": CacheLRU(1, ttl=3600),
+        "dados": CacheLRU(MAX_ITENS_POR_CACHE, ttl=TTL_CACHE_DADOS),
+        "disponibilidade": CacheLRU(MAX_ITENS_POR_CACHE, ttl=TTL_CACHE_DADOS),
+        "indices": CacheLRU(MAX_ITENS_POR_CACHE),
+    }
+
+
+# Função para obter um cache isolado da barbearia ("dados", "disponibilidade", ...)
+def cache_tenant(tenant_id, nome):
+    caches = _caches_por_tenant().get_or_create(tenant_id, _novos_caches)
+    if nome not in caches:
+        caches[nome] = CacheLRU(MAX_ITENS_POR_CACHE, ttl=TTL_CACHE_DADOS)
+    return caches[nome]
+
+
+# Função para invalidar os dados em cache de uma barbearia após alterações
+def limpar_cache_tenant(tenant_id):
+    caches = _caches_por_tenant().get(tenant_id)
+    if caches:
+        for nome, cache in caches.items():
+            if nome not in CACHES_PERSISTENTES:
+                cache.clear()
+
+
+# Função para abrir a planilha do Google Sheets usando o cliente compartilhado
+def abrir_planilha_sheets(tenant):
+    cache = cache_tenant(tenant["id"], "planilha")
+    planilha = cache.get("planilha")
+    if planilha is None:
+        planilha = get_gspread_client().open_by_key(tenant["spreadsheet_id"])
+        cache.set("planilha", planilha)
+    return planilha
+
+
+# Função para obter a pasta de arquivos de dados da barbearia
+def pasta_dados(tenant):
+    return tenant.get("pasta_eventos") or os.path.join("eventos", tenant["id"])
+
+
+# Função para abrir o log de eventos da barbearia
+def abrir_log_eventos(tenant):
+    return abrir_log(pasta_dados(tenant))
+
+
+# Função para registrar um evento no log da barbearia; uma falha no log
+# (disco cheio, pasta sem permissão) só gera um aviso e não desfaz a operação
+def registrar_evento(tenant, tipo, dados):
+    try:
+        return abrir_log_eventos(tenant).registrar(tipo, dados)
+    except Exception as e:
+        st.warning(f"Operação concluída, mas não foi registrada no log de eventos: {str(e)}")
+        return None
+
+
+# Função para obter a pasta dos arquivos .xlsx locais da barbearia
+def pasta_local(tenant):
+    return tenant.get("pasta_local") or os.path.join("locais", tenant["id"])
+
+
+# Função para criar os .xlsx locais da barbearia a partir das planilhas modelo
+def preparar_pasta_local(tenant):
+    pasta = pasta_local(tenant)
+    modelo = tenant.get("pasta_modelo")
+    if not modelo or os.path.abspath(modelo) == os.path.abspath(pasta):
+        return pasta
+    os.makedirs(pasta, exist_ok=True)
+    for arquivo in ARQUIVOS_PADRAO.values():
+        origem = os.path.join(modelo, arquivo)
+        destino = os.path.join(pasta, arquivo)
+        with trava_arquivo(destino):
+            if os.path.exists(origem) and not os.path.exists(destino):
+                shutil.copyfile(origem, f"{destino}.tmp")
+                os.replace(f"{destino}.tmp", destino)
+    return pasta
+
+
+# Função para abrir os arquivos .xlsx locais da barbearia
+def abrir_planilha_local(tenant):
+    return PlanilhaLocal(preparar_pasta_local(tenant))
+
+
+# Função para verificar se a barbearia está usando os arquivos locais
+def usa_backend_local(tenant):
+    return os.environ.get(VARIAVEL_BACKEND, tenant.get("backend", "sheets")) == "local"
+
+
+# Função para obter o arquivo com os agendamentos feitos durante uma queda do Sheets
+def caminho_pendentes(tenant):
+    return os.path.join(pasta_dados(tenant), "pendentes_sheets.jsonl")
+
+
+# Função para ler os agendamentos que ainda precisam ir para o Google Sheets
+def _ler_pendentes(caminho):
+    if not os.path.exists(caminho):
+        return []
+    with open(caminho, encoding="utf-8") as f:
+        return [json.loads(linha) for linha in f if linha.strip()]
+
+
+# Função para contar os agendamentos que aguardam o retorno do Google Sheets
+def contar_pendentes(tenant):
+    caminho = caminho_pendentes(tenant)
+    if not os.path.exists(caminho):
+        return 0
+    with trava_arquivo(caminho):
+        return len(_ler_pendentes(caminho))
+
+
+# Aba local usada durante a queda do Sheets: inclusões também são anotadas para
+# reenvio; remoções e regravações não teriam como ser repetidas no Sheets.
+class AbaReserva:
+    def __init__(self, aba, pendentes):
+        self._aba = aba
+        self._pendentes = pendentes
+        self.title = aba.title
+
+    def get_all_values(self, *args, **kwargs):
+        return self._aba.get_all_values(*args, **kwargs)
+
+    def get_all_records(self, *args, **kwargs):
+        return self._aba.get_all_records(*args, **kwargs)
+
+    def row_values(self, *args, **kwargs):
+        return self._aba.row_values(*args, **kwargs)
+
+    def update_cell(self, *args, **kwargs):
+        return self._aba.update_cell(*args, **kwargs)
+
+    def append_row(self, valores, **kwargs):
+        with trava_arquivo(self._pendentes):
+            self._aba.append_row(valores, **kwargs)
+            registro = dict(zip(self._aba.row_values(1), valores))
+            with open(self._pendentes, "a", encoding="utf-8") as f:
+                f.write(json.dumps({
+                    'aba': self.title,
+                    'registro': registro,
+                    'momento': datetime.now().strftime('%d/%m/%Y %H:%M:%S'),
+                }, ensure_ascii=False, default=str) + "\n")
+
+    def _bloqueado(self, *args, **kwargs):
+        raise RuntimeError("Google Sheets indisponível: só novos agendamentos podem ser gravados até ele voltar")
+
+    delete_rows = clear = update = _bloqueado
+
+
+class PlanilhaReserva(PlanilhaLocal):
+    def __init__(self, tenant):
+        super().__init__(preparar_pasta_local(tenant))
+        self.pendentes = caminho_pendentes(tenant)
+        os.makedirs(os.path.dirname(self.pendentes), exist_ok=True)
+
+    def worksheet(self, title):
+        return AbaReserva(super().worksheet(title), self.pendentes)
+
+
+# Função para reenviar ao Google Sheets os agendamentos feitos durante a queda.
+# Cada item sai do arquivo assim que é gravado; os que falharem ficam para depois.
+def reenviar_pendentes(tenant, planilha):
+    caminho = caminho_pendentes(tenant)
+    if not os.path.exists(caminho):
+        return 0
+    with trava_arquivo(caminho):
+        pendentes = _ler_pendentes(caminho)
+        enviados = 0
+        try:
+            for item in pendentes:
+                aba = planilha.worksheet(item['aba'])
+                aba.append_row(linha_agendamento(aba, item['registro']))
+                enviados += 1
+        finally:
+            restantes = pendentes[enviados:]
+            if restantes:
+                temporario = f"{caminho}.tmp"
+                with open(temporario, "w", encoding="utf-8") as f:
+                    f.writelines(json.dumps(item, ensure_ascii=False) + "\n" for item in restantes)
+                os.replace(temporario, caminho)
+            else:
+                os.remove(caminho)
+    return enviados
+
+
+# Função para trocar para os arquivos locais quando o Google Sheets falha.
+# Descarta a planilha em cache e os dados lidos do Sheets; a reserva vale até o
+# próximo limpar_cache_tenant/TTL, quando o Sheets é tentado de novo.
+def usar_reserva_local(tenant, erro):
+    if not tenant.get("fallback_local"):
+        raise erro
+    st.warning(f"Google Sheets indisponível ({str(erro)}). Usando os arquivos locais.")
+    cache_tenant(tenant["id"], "planilha").clear()
+    limpar_cache_tenant(tenant["id"])
+    reserva = PlanilhaReserva(tenant)
+    cache_tenant(tenant["id"], "dados").set("planilha_reserva", reserva)
+    return reserva
+
+
+# Aba do Sheets que troca para a aba local se uma operação falhar
+class AbaComReserva:
+    def __init__(self, planilha, aba):
+        self._planilha = planilha
+        self._aba = aba
+        self.title = aba.title
+
+    def _executar(self, metodo, *args, repetir=True, **kwargs):
+        try:
+            return getattr(self._aba, metodo)(*args, **kwargs)
+        except Exception as e:
+            self._aba = self._planilha.trocar_para_reserva(e).worksheet(self.title)
+            if not repetir:
+                raise
+            return getattr(self._aba, metodo)(*args, **kwargs)
+
+    def get_all_values(self, *args, **kwargs):
+        return self._executar("get_all_values", *args, **kwargs)
+
+    def get_all_records(self, *args, **kwargs):
+        return self._executar("get_all_records", *args, **kwargs)
+
+    def row_values(self, *args, **kwargs):
+        return self._executar("row_values", *args, **kwargs)
+
+    def append_row(self, *args, **kwargs):
+        return self._executar("append_row", *args, **kwargs)
+
+    # A linha foi calculada sobre os dados do Sheets: não repetir nos arquivos locais
+    def delete_rows(self, *args, **kwargs):
+        return self._executar("delete_rows", *args, repetir=False, **kwargs)
+
+    def update_cell(self, *args, **kwargs):
+        return self._executar("update_cell", *args, **kwargs)
+
+    def clear(self, *args, **kwargs):
+        return self._executar("clear", *args, **kwargs)
+
+    def update(self, *args, **kwargs):
+        return self._executar("update", *args, **kwargs)
+
+
+# Planilha do Sheets com troca para os arquivos locais no momento do uso
+# (a planilha fica em cache por uma hora; a queda pode começar depois de abri-la)
+class PlanilhaComReserva:
+    def __init__(self, tenant, planilha):
+        self.tenant = tenant
+        self.planilha = planilha
+
+    @property
+    def id(self):
+        return self.planilha.id
+
+    def trocar_para_reserva(self, erro):
+        if not isinstance(self.planilha, PlanilhaLocal):
+            self.planilha = usar_reserva_local(self.tenant, erro)
+        return self.planilha
+
+    def worksheet(self, title):
+        if isinstance(self.planilha, PlanilhaLocal):
+            return self.planilha.worksheet(title)
+        try:
+            return AbaComReserva(self, self.planilha.worksheet(title))
+        except WorksheetNotFound:
+            raise
+        except Exception as e:
+            return self.trocar_para_reserva(e).worksheet(title)
+
+    def worksheets(self):
+        return self.planilha.worksheets()
+
+
+# Função para montar a linha de um agendamento na ordem do cabeçalho da aba.
+# Colunas novas (ex.: "Barbeiro" em planilhas antigas) são acrescentadas ao cabeçalho.
+def linha_agendamento(worksheet, registro):
+    cabecalho = worksheet.row_values(1)
+    for coluna in COLUNAS_AGENDAMENTOS:
+        if coluna not in cabecalho:
+            cabecalho.append(coluna)
+            worksheet.update_cell(1, len(cabecalho), coluna)
+    return [registro.get(coluna, "") for coluna in cabecalho]
+
+
+# Função para verificar se a planilha aberta está nos arquivos locais
+def planilha_e_local(planilha):
+    if isinstance(planilha, PlanilhaComReserva):
+        planilha = planilha.planilha
+    return isinstance(planilha, PlanilhaLocal)
+
+
+# Função para abrir a planilha da barbearia no backend configurado
+def abrir_planilha(tenant):
+    if usa_backend_local(tenant):
+        return abrir_planilha_local(tenant)
+    # Sheets fora do ar: usar os arquivos locais por um tempo antes de tentar de novo
+    reserva = cache_tenant(tenant["id"], "dados").get("planilha_reserva")
+    if reserva is not None:
+        return reserva
+    try:
+        planilha = abrir_planilha_sheets(tenant)
+        # Sheets de volta: primeiro grava os agendamentos feitos durante a queda
+        if reenviar_pendentes(tenant, planilha):
+            limpar_cache_tenant(tenant["id"])
+            st.info("Agendamentos feitos durante a queda do Google Sheets foram reenviados.")
+        return PlanilhaComReserva(tenant, planilha)
+    except Exception as e:
+        return usar_reserva_local(tenant, e)